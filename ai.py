@@ -1,64 +1,334 @@
-
 from __future__ import annotations
+import io, os, json, sqlite3, hashlib, threading, unicodedata
+from collections import OrderedDict
 from typing import List, Dict, Any
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
-from nltk.sentiment import SentimentIntensityAnalyzer
 
-_SIA = None
+from rules import compiled
+from cache import resource, STORE
+from metrics import timed
+
+SENTIMENT_VERSION = 1         # bump when sentiment scoring itself changes; lexicon edits are picked up by hash
+SENTIMENT_CACHE = os.environ.get("ITERRATE_SENTIMENT_CACHE", "sentiment_cache.db")   # "off" disables the disk tier
+SENTIMENT_LRU = 50_000
+PARALLEL_MIN = 2000           # fewer misses than this are scored in-process; a pool costs more than it saves
+N_FEATURES = 2 ** 15          # hashed term space shared by every project
+DRIFT_THRESHOLD = 0.25        # refit once new points sit 25% further from centroids than at last fit
+MIN_DRIFT_SAMPLES = 20
+
+# scikit-learn, SciPy and NLTK take seconds to import; they load on first use (or in warm_up), so pages
+# that never score or cluster text never pay for them.
 
 def _get_sia():
-    global _SIA
-    if _SIA is None:
-        _SIA = SentimentIntensityAnalyzer()
-    return _SIA
+    def build():
+        from nltk.sentiment import SentimentIntensityAnalyzer
+        return SentimentIntensityAnalyzer()
+    return resource("vader", build)
 
-def sentiment_score(text: str) -> float:
-    if not text.strip():
-        return 0.0
+def _get_hasher():
+    def build():
+        from sklearn.feature_extraction.text import HashingVectorizer
+        return HashingVectorizer(ngram_range=(1,2), stop_words="english", n_features=N_FEATURES,
+                                 alternate_sign=False, norm=None)
+    return resource("hasher", build)
+
+def warm_up():
+    """Preload the lexicon, the vectorizer and the clustering modules (run in a background thread after first paint)."""
+    try:
+        lexicon_version()
+    except LookupError:   # lexicon not downloaded; sentiment_score reports it on first use
+        pass
+    _get_hasher().transform(["warm up"])
+    import sklearn.cluster, sklearn.preprocessing, scipy.optimize  # noqa: F401
+
+def lexicon_version() -> str:
+    sia = _get_sia()   # outside the factory: resource() holds its lock while building
+    def build():
+        lexicon = json.dumps(sorted(sia.lexicon.items())).encode()
+        return hashlib.blake2b(lexicon + str(SENTIMENT_VERSION).encode(), digest_size=8).hexdigest()
+    return resource("vader_version", build)
+
+def normalize(text: str) -> str:
+    # VADER tokenizes on whitespace and reads case and punctuation, so only whitespace and unicode form can go
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+class SentimentCache:
+    """Compound scores keyed by hash(lexicon version, normalized text): an in-process LRU in front of
+    a SQLite file shared by every process on the host. Disk errors only cost a rescore."""
+
+    def __init__(self, path: str = SENTIMENT_CACHE, maxsize: int = SENTIMENT_LRU):
+        self.path, self.maxsize = path, maxsize
+        self.lru: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.conn, self.pid = None, None
+
+    def _disk(self):
+        if self.path == "off":
+            return None
+        if self.pid != os.getpid():   # never share a connection with a forked parent
+            self.conn, self.pid = sqlite3.connect(self.path, timeout=5, check_same_thread=False), os.getpid()
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS sentiment (key BLOB PRIMARY KEY, score REAL NOT NULL)")
+        return self.conn
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, float]:
+        found = {}
+        with self.lock:
+            for k in keys:
+                if k in self.lru:
+                    self.lru.move_to_end(k)
+                    found[k] = self.lru[k]
+            missing = [k for k in dict.fromkeys(keys) if k not in found]
+            try:
+                conn = self._disk() if missing else None
+                for i in range(0, len(missing) if conn else 0, 900):
+                    part = missing[i:i + 900]
+                    rows = conn.execute(f"SELECT key, score FROM sentiment WHERE key IN ({','.join('?' * len(part))})", part)
+                    found.update(rows)
+            except sqlite3.Error:
+                pass
+            self._remember(found)
+        return found
+
+    def put_many(self, scores: Dict[bytes, float]):
+        with self.lock:
+            self._remember(scores)
+            try:
+                conn = self._disk()
+                if conn is not None:
+                    with conn:
+                        conn.executemany("INSERT OR REPLACE INTO sentiment (key, score) VALUES (?, ?)", scores.items())
+            except sqlite3.Error:
+                pass
+
+    def _remember(self, scores: Dict[bytes, float]):
+        for k, v in scores.items():
+            self.lru[k] = v
+            self.lru.move_to_end(k)
+        while len(self.lru) > self.maxsize:
+            self.lru.popitem(last=False)
+
+def _sentiment_cache() -> SentimentCache:
+    return resource("sentiment_cache", SentimentCache)
+
+def _score_chunk(texts: List[str]) -> List[float]:
+    # top-level so it can be shipped to a process pool
     sia = _get_sia()
-    s = sia.polarity_scores(text)
-    return float(s.get("compound", 0.0))
-
-def grade_quality(text: str) -> Dict[str, float]:
-    t = text.lower()
-    length_score = min(len(t) / 300.0, 1.0)
-    generic_penalty = sum(int(w in t) for w in ["good", "bad", "nice", "cool", "great"])
-    specificity = max(0.0, length_score - 0.1 * generic_penalty)
-    helpful_terms = ["change", "add", "remove", "because", "should", "consider", "instead", "confusing", "unclear", "rename", "button", "cta", "contrast", "align", "spacing", "onboarding"]
-    helpfulness = min(1.0, sum(1 for w in helpful_terms if w in t) / 6.0)
-    quality = 0.6 * specificity + 0.4 * helpfulness
-    return {"specificity": specificity, "helpfulness": helpfulness, "quality": quality}
-
-def cluster_feedback(texts: List[str], k: int = 4) -> Dict[str, Any]:
-    if not texts:
+    return [float(sia.polarity_scores(t).get("compound", 0.0)) for t in texts]
+
+def score_uncached(texts: List[str], processes: int | None = 1) -> List[float]:
+    processes = processes or os.cpu_count() or 1
+    if processes < 2 or len(texts) < PARALLEL_MIN:
+        return _score_chunk(texts)
+    from concurrent.futures import ProcessPoolExecutor
+    size = -(-len(texts) // (processes * 4))
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return [s for part in pool.map(_score_chunk, [texts[i:i + size] for i in range(0, len(texts), size)]) for s in part]
+
+@timed("ai.sentiment_scores")
+def sentiment_scores(texts: List[str], processes: int | None = 1) -> List[float]:
+    """Compound VADER score per text, batch-wise. Repeated content is served from the cache; the misses are
+    scored here, or across `processes` workers (None = all cores) when there are at least PARALLEL_MIN."""
+    norm = [normalize(t) for t in texts]
+    if not any(norm):
+        return [0.0] * len(norm)
+    version = lexicon_version().encode()
+    keys = [hashlib.blake2b(version + b"\0" + t.encode(), digest_size=16).digest() for t in norm]
+    cache = _sentiment_cache()
+    scores = cache.get_many([k for k, t in zip(keys, norm) if t])
+    todo = {k: t for k, t in zip(keys, norm) if t and k not in scores}
+    STORE.stats["sentiment"]["hits"] += sum(1 for t in norm if t) - len(todo)
+    STORE.stats["sentiment"]["misses"] += len(todo)
+    if todo:
+        new = dict(zip(todo, score_uncached(list(todo.values()), processes)))
+        cache.put_many(new)
+        scores.update(new)
+    return [scores[k] if t else 0.0 for k, t in zip(keys, norm)]
+
+@timed("ai.sentiment_score")
+def sentiment_score(text: str) -> float:
+    return sentiment_scores([text])[0]
+
+@timed("ai.grade_quality")
+def grade_quality(text: str, rules: Dict[str, Any] | None = None) -> Dict[str, float]:
+    return compiled(rules).evaluate(text)[0]
+
+@timed("ai.grade_quality_batch")
+def grade_quality_batch(texts, rules: Dict[str, Any] | None = None) -> List[Dict[str, float]]:
+    return [g for g, _ in compiled(rules).evaluate_batch(texts)]
+
+@timed("ai.term_counts")
+def term_counts(texts: List[str], vocab: Dict[int, str] | None = None):
+    """Raw hashed uni/bigram counts; records a readable name per bucket in `vocab` when given."""
+    hasher = _get_hasher()
+    X = hasher.transform(texts)
+    if vocab is not None:
+        from sklearn.utils import murmurhash3_32
+        analyze = hasher.build_analyzer()
+        for t in texts:
+            for term in analyze(t):
+                vocab.setdefault(abs(murmurhash3_32(term, seed=0)) % N_FEATURES, term)
+    return X
+
+class ClusterState:
+    """Hashed TF-IDF space + centroids for one project, updated mini-batch style between full refits."""
+
+    def __init__(self):
+        self.centroids = None                      # (k, N_FEATURES) float32
+        self.counts = np.zeros(0, dtype=np.int64)  # points absorbed per centroid
+        self.ids: List[int] = []                   # stable cluster id of each centroid row
+        self.df = np.zeros(N_FEATURES, dtype=np.int64)
+        self.n_docs = 0
+        self.vocab: Dict[int, str] = {}
+        self.baseline = 0.0                        # mean sq. distance at last full fit
+        self.drift = 0.0                           # EMA of sq. distance for incremental assignments
+        self.n_at_refit = 0
+        self.since_refit = 0
+
+    @property
+    def fitted(self) -> bool:
+        return self.centroids is not None and len(self.ids) > 0
+
+    def needs_refit(self) -> bool:
+        if not self.fitted:
+            return True
+        if self.since_refit > self.n_at_refit:
+            return True
+        return self.since_refit >= MIN_DRIFT_SAMPLES and self.drift > (self.baseline + 1e-9) * (1 + DRIFT_THRESHOLD)
+
+    def _weight(self, X):
+        from sklearn.preprocessing import normalize
+        idf = np.log((1 + self.n_docs) / (1 + self.df)) + 1.0
+        return normalize(X.multiply(idf.reshape(1, -1)).tocsr())
+
+    def _sq_dist(self, W):
+        sq_c = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        sq_w = np.asarray(W.multiply(W).sum(axis=1)).ravel()
+        return np.maximum(sq_w[:, None] - 2 * np.asarray(W @ self.centroids.T) + sq_c[None, :], 0.0)
+
+    def _match_ids(self, new_centroids) -> List[int]:
+        k = new_centroids.shape[0]
+        ids = [-1] * k
+        if self.fitted:
+            from scipy.optimize import linear_sum_assignment
+            from sklearn.preprocessing import normalize
+            sim = normalize(new_centroids) @ normalize(self.centroids).T
+            rows, cols = linear_sum_assignment(-sim)
+            for r, c in zip(rows, cols):
+                ids[r] = self.ids[c]
+        free = (i for i in range(k + len(self.ids)) if i not in ids)
+        return [cid if cid >= 0 else next(free) for cid in ids]
+
+    def fit(self, X, k: int) -> List[int]:
+        self.df = np.bincount(X.indices, minlength=N_FEATURES).astype(np.int64)
+        self.n_docs = X.shape[0]
+        W = self._weight(X)
+        k = min(k, max(1, W.shape[0]))
+        from sklearn.cluster import MiniBatchKMeans
+        model = MiniBatchKMeans(n_clusters=k, n_init=3, random_state=42, batch_size=1024)
+        rows = model.fit_predict(W)
+        centroids = model.cluster_centers_.astype(np.float32)
+        self.ids = self._match_ids(centroids)
+        self.centroids = centroids
+        self.counts = np.bincount(rows, minlength=k).astype(np.int64)
+        self.baseline = float(self._sq_dist(W)[np.arange(W.shape[0]), rows].mean())
+        self.drift = self.baseline
+        self.n_at_refit = self.n_docs
+        self.since_refit = 0
+        return [self.ids[r] for r in rows]
+
+    def partial_fit(self, X) -> List[int]:
+        self.df += np.bincount(X.indices, minlength=N_FEATURES)
+        self.n_docs += X.shape[0]
+        W = self._weight(X)
+        d = self._sq_dist(W)
+        rows = d.argmin(axis=1)
+        for j in np.unique(rows):
+            members = rows == j
+            n = int(members.sum())
+            self.counts[j] += n
+            total = np.asarray(W[members].sum(axis=0)).ravel()
+            self.centroids[j] += (total - n * self.centroids[j]) / self.counts[j]
+        for dist in d[np.arange(len(rows)), rows]:
+            self.drift = 0.95 * self.drift + 0.05 * float(dist)
+        self.since_refit += X.shape[0]
+        return [self.ids[r] for r in rows]
+
+    def top_terms(self, n: int = 8) -> Dict[int, List[str]]:
+        out = {}
+        for row, cid in enumerate(self.ids):
+            terms = []
+            for idx in self.centroids[row].argsort()[::-1]:
+                if self.centroids[row, idx] <= 0 or len(terms) >= n:
+                    break
+                if int(idx) in self.vocab:
+                    terms.append(self.vocab[int(idx)])
+            out[cid] = terms
+        return dict(sorted(out.items()))
+
+    def to_bytes(self) -> bytes:
+        meta = {"ids": self.ids, "n_docs": self.n_docs, "baseline": self.baseline, "drift": self.drift,
+                "n_at_refit": self.n_at_refit, "since_refit": self.since_refit,
+                "vocab": {str(i): t for i, t in self.vocab.items()}}
+        buf = io.BytesIO()
+        arrays = {"df": self.df, "counts": self.counts}
+        if self.centroids is not None:
+            arrays["centroids"] = self.centroids
+        np.savez_compressed(buf, meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8), **arrays)
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "ClusterState":
+        state = cls()
+        with np.load(io.BytesIO(blob)) as z:
+            meta = json.loads(z["meta"].tobytes().decode())
+            state.df = z["df"].astype(np.int64)
+            state.counts = z["counts"].astype(np.int64)
+            state.centroids = z["centroids"].copy() if "centroids" in z.files else None
+        state.ids = meta["ids"]; state.n_docs = meta["n_docs"]
+        state.baseline = meta["baseline"]; state.drift = meta["drift"]
+        state.n_at_refit = meta["n_at_refit"]; state.since_refit = meta["since_refit"]
+        state.vocab = {int(i): t for i, t in meta["vocab"].items()}
+        return state
+
+def _as_counts(texts, vocab: Dict[int, str]):
+    from scipy.sparse import issparse
+    if issparse(texts):
+        return texts.tocsr()
+    return term_counts(list(texts), vocab) if texts else term_counts([""])[:0]
+
+@timed("ai.cluster_feedback")
+def cluster_feedback(texts, k: int = 4, state: ClusterState | None = None) -> Dict[str, Any]:
+    """Full refit over texts or a precomputed term_counts matrix.
+    Pass a persisted `state` to keep cluster ids stable across refits."""
+    state = state if state is not None else ClusterState()
+    X = _as_counts(texts, state.vocab)
+    if X.shape[0] == 0:
         return {"labels": [], "top_terms": {}}
-    vect = TfidfVectorizer(ngram_range=(1,2), min_df=1, stop_words="english")
-    X = vect.fit_transform(texts)
-    k = min(k, max(1, X.shape[0]))
-    model = KMeans(n_clusters=k, n_init=10, random_state=42)
-    labels = model.fit_predict(X)
-    order_centroids = model.cluster_centers_.argsort()[:, ::-1]
-    terms = np.array(vect.get_feature_names_out())
-    top_terms = {i: terms[order_centroids[i, :8]].tolist() for i in range(k)}
-    return {"labels": labels.tolist(), "top_terms": top_terms}
+    labels = state.fit(X, k)
+    return {"labels": labels, "top_terms": state.top_terms()}
+
+@timed("ai.assign_clusters")
+def assign_clusters(texts, state: ClusterState) -> List[int]:
+    """Incremental assignment of new texts (or term_counts rows) to a fitted state; nudges the chosen centroids."""
+    X = _as_counts(texts, state.vocab)
+    if X.shape[0] == 0 or not state.fitted:
+        return []
+    return state.partial_fit(X)
 
+@timed("ai.do_next_cards")
 def do_next_cards(cluster_terms: Dict[int, List[str]]) -> List[Dict[str, Any]]:
     cards = []
-    for cid, terms in cluster_terms.items():
+    n = len(cluster_terms) or 1
+    for rank, cid in enumerate(sorted(cluster_terms)):
+        terms = cluster_terms[cid]
         title = f"Issue Cluster #{cid}: " + ", ".join(terms[:3])
         action = f"Investigate and address issues related to: {', '.join(terms[:6])}."
-        impact = round(0.6 + 0.4 * (1.0 - cid / (len(cluster_terms) or 1)), 2)
-        effort = round(0.3 + 0.2 * (cid / (len(cluster_terms) or 1)), 2)
+        impact = round(0.6 + 0.4 * (1.0 - rank / n), 2)
+        effort = round(0.3 + 0.2 * (rank / n), 2)
         cards.append({"cluster_id": cid, "title": title, "action": action, "impact": impact, "effort": effort})
     return cards
 
-def instant_fix_suggestions(text: str):
-    t = text.lower()
-    fixes = []
-    if "button" in t or "cta" in t: fixes.append("Try a higher-contrast primary CTA above the fold.")
-    if "signup" in t or "sign up" in t or "onboarding" in t: fixes.append("Reduce onboarding to 2–3 steps; add progress indicator.")
-    if "readable" in t or "font" in t or "contrast" in t: fixes.append("Increase base font to 16–18px; check WCAG AA contrast.")
-    if "confusing" in t or "unclear" in t: fixes.append("Rewrite labels with verbs; add helper text or examples.")
-    return fixes[:3]
+@timed("ai.instant_fix_suggestions")
+def instant_fix_suggestions(text: str, rules: Dict[str, Any] | None = None):
+    return compiled(rules).evaluate(text)[1]
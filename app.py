@@ -1,16 +1,21 @@
 
 from __future__ import annotations
-import os, datetime as dt
+import os, threading, datetime as dt
 import pandas as pd
 import streamlit as st
-import plotly.graph_objects as go
 
-from db import init_db, SessionLocal, User, Project, Quest, Feedback, ClusterSummary
-from ai import sentiment_score, grade_quality, cluster_feedback, do_next_cards, instant_fix_suggestions
-from utils import mk_slug, reward_points, sample_badges
+from db import init_db, reset_db, SessionLocal, User, Project, Quest, bump
+from dedup import DuplicateFeedback
+from health import project_health, health_value, ensure_aggregates
+from ledger import ensure_opening_balances
+import repo, leaderboard, cache, metrics, rollups, raids
+from search import search
+from jobs import ACTIVE, enqueue, latest_job, summaries, spawn_worker, stop_worker
+from utils import mk_slug
 
-Session = init_db()
+metrics.begin_rerun()
 st.set_page_config(page_title="IterRate — MVP", page_icon="🚀", layout="wide")
+Session = st.cache_resource(init_db, show_spinner=False)()   # schema check once per server process
 
 # ---- Global CSS (cards + hero) ----
 st.markdown("""
@@ -52,26 +57,61 @@ def login_box():
             st.rerun()
         db.close()
 
+@st.cache_resource(show_spinner=False)
 def ensure_seed():
     db = Session()
     if db.query(User).count() == 0:
         import seed; seed.seed()
+    ensure_aggregates(db)
+    ensure_opening_balances(db)
     db.close()
 
 ensure_seed()
 
+@st.cache_resource
+def start_job_worker():
+    # one local worker per server; set ITERRATE_WORKER=external when running `python jobs.py` yourself
+    if os.environ.get("ITERRATE_WORKER", "spawn") == "spawn":
+        return spawn_worker()
+
+start_job_worker()
+
+@st.cache_resource
+def start_warm_up():
+    # loads VADER, the vectorizer and sklearn off the critical path; ITERRATE_WARMUP=off to skip
+    if os.environ.get("ITERRATE_WARMUP", "on") != "off":
+        import ai
+        t = threading.Thread(target=ai.warm_up, name="iterrate-warm-up", daemon=True)
+        t.start()
+        return t
+
 # ---- Optional: reset DB for demo ----
 with st.sidebar.expander("⚙️ Admin / Demo tools"):
     if st.button("Reset demo database"):
         try:
-            db = Session(); db.close()
-            if os.path.exists("iterate.db"):
-                os.remove("iterate.db")
+            reset_db()
             import seed; seed.seed()
+            cache.STORE.clear()
+            cache.resource("cluster_states", dict).clear()   # keyed on model versions, which restart
+            leaderboard.invalidate()
+            worker = start_job_worker()
+            if worker is not None:   # its cluster states are stale too
+                stop_worker(worker)
+                start_job_worker.clear()
+                start_job_worker()
             st.success("Database reset & reseeded.")
             st.rerun()
         except Exception as e:
             st.error(f"Reset failed: {e}")
+    st.caption("Cache (hits / misses per cache since server start)")
+    st.dataframe(pd.DataFrame(cache.stats()), hide_index=True, use_container_width=True)
+    if "user_id" in st.session_state:   # statements and timings are for signed-in users only
+        st.caption("Profiling — p50/p95 in ms (`:queries` rows are counts per rerun)")
+        st.dataframe(pd.DataFrame(metrics.summary()), hide_index=True, use_container_width=True)
+        st.caption("Slowest SQL")
+        st.dataframe(pd.DataFrame(metrics.slowest_queries()), hide_index=True, use_container_width=True)
+        if st.button("Export metrics", help="Writes to ITERRATE_METRICS_FILE (default metrics.prom)"):
+            st.success(f"Wrote {metrics.export()}")
 
 if "user_id" not in st.session_state:
     st.markdown("""<div class='hero'>
@@ -79,30 +119,148 @@ if "user_id" not in st.session_state:
     <p class='smallmuted'>Create feedback quests, crowdsource insights, auto-cluster issues, and get action cards.</p>
     </div>""", unsafe_allow_html=True)
     login_box()
+    start_warm_up()
     st.stop()
 
 db = Session()
-me = db.query(User).get(st.session_state["user_id"])
+me = db.get(User, st.session_state["user_id"])
 
 st.sidebar.write(f"Signed in as **{me.name or me.email}** ({me.role})")
 page = st.sidebar.radio("Navigate", ["Home", "Projects", "Quests", "Feedback", "Insights", "Leaderboards", "Raids"])
 
-def render_health_gauge(project_id: int):
-    N = 200
-    fb = db.query(Feedback).join(Quest).filter(Quest.project_id==project_id).order_by(Feedback.created_at.desc()).limit(N).all()
-    if not fb:
+def render_health_gauge(health: float | None):
+    if health is None:
         st.info("No feedback yet for health gauge.")
         return
-    avg_sent = sum(f.sentiment for f in fb)/len(fb)
-    density = min(1.0, len(fb)/N)
-    health = round(50 + 50*avg_sent * density, 1)
+    import plotly.graph_objects as go
     fig = go.Figure(go.Indicator(
         mode="gauge+number",
         value=health,
         gauge={'axis': {'range': [0,100]}, 'bar': {'thickness': 0.3}},
         title={'text': "Impact Meter (Site Health)"}
     ))
-    st.plotly_chart(fig, use_container_width=True)
+    with metrics.span("render:plotly"):
+        st.plotly_chart(fig, use_container_width=True)
+
+@st.fragment(run_every=2)
+def render_cluster_summaries(project_id: int, quest_id: int | None = None):
+    s = Session()
+    try:
+        job = latest_job(s, project_id, quest_id)
+        if job and job.status in ACTIVE:
+            st.caption(f"Clustering {job.status}… results below are from the last completed run.")
+        elif job and job.status == "failed":
+            st.error(f"Last clustering job failed: {job.error}")
+        for c in summaries(s, project_id, quest_id):
+            nxt = (c.do_next or [{}])[0]
+            st.info(f"**{c.title}**\n{nxt.get('action', '')}\nImpact: {nxt.get('impact')} · Effort: {nxt.get('effort')}")
+    finally:
+        s.close()
+
+@st.fragment(run_every=2)
+def render_raid_counts(raid_id: int, goal: int):
+    """Served from the in-process counters, so a room full of viewers never touches the database."""
+    c = raids.counts(raid_id)
+    cols = st.columns(2)
+    cols[0].metric("Reviewers", f"{c['reviewers']} / {goal}")
+    cols[1].metric("Submissions", c["submissions"])
+    st.progress(min(1.0, c["reviewers"] / goal) if goal else 1.0)
+
+def submit_and_report(quest_id: int, text: str):
+    try:
+        pts = raids.submit(db, quest_id, me.id, text)
+        st.success(f"Submitted. Earned {pts} points.")
+    except DuplicateFeedback as e:
+        st.error(f"This is almost identical to your feedback #{e.original_id}, so it wasn't submitted.")
+    except TimeoutError:   # the raid buffer still holds it and will write it; a resubmit would be a copy
+        st.warning("Your feedback is queued and will be saved shortly; no need to submit it again.")
+
+TREND_RANGES = {"Last 48 hours": ("hour", 2), "Last 30 days": ("day", 30), "Last 90 days": ("day", 90),
+                "Last 365 days": ("day", 365)}
+
+def render_trends(project_id: int):
+    """Reads only the rollup buckets, never raw feedback."""
+    cols = st.columns(2)
+    grain, days = TREND_RANGES[cols[0].selectbox("Range", list(TREND_RANGES), index=1)]
+    scopes = [("Whole project", rollups.ALL_QUESTS, rollups.ALL_CLUSTERS)]
+    scopes += [(f"Quest: {q.title}", q.id, rollups.ALL_CLUSTERS) for q in repo.quests(db, owner_id=me.id) if q.project_id == project_id]
+    scopes += [(c.title, rollups.ALL_QUESTS, c.cluster_id) for c in summaries(db, project_id)]
+    _, quest_id, cluster_id = cols[1].selectbox("Scope", scopes, format_func=lambda s: s[0])
+    since = rollups.bucket_start(dt.datetime.utcnow() - dt.timedelta(days=days), grain)
+    points = rollups.series(db, project_id, grain, since, quest_id=quest_id, cluster_id=cluster_id)
+    if not points:
+        st.info("No feedback in this range yet.")
+        return
+    df = pd.DataFrame(points).set_index("bucket")
+    st.caption("Reviews per " + grain)
+    st.bar_chart(df["n"])
+    st.caption("Mean sentiment and quality")
+    st.line_chart(df[["sentiment", "quality"]])
+    st.caption("Quality distribution")
+    edges = [i / rollups.HIST_BINS for i in range(rollups.HIST_BINS + 1)]
+    st.bar_chart(pd.DataFrame({"reviews": [sum(h) for h in zip(*df["hist"])]},
+                              index=[f"{lo:.1f}–{hi:.1f}" for lo, hi in zip(edges, edges[1:])]))
+
+def render_search(project_id: int):
+    query = st.text_input("Search feedback", placeholder='subscription toggle, or "an exact phrase"')
+    cols = st.columns(4)
+    quests = [q for q in repo.quests(db, owner_id=me.id) if q.project_id == project_id]
+    quest = cols[0].selectbox("Quest", [None] + quests, format_func=lambda q: "All quests" if q is None else q.title)
+    sent = cols[1].slider("Sentiment", -1.0, 1.0, (-1.0, 1.0), 0.1)
+    min_quality = cols[2].slider("Min quality", 0.0, 1.0, 0.0, 0.05)
+    titles = {c.cluster_id: c.title for c in summaries(db, project_id)}
+    cluster = cols[3].selectbox("Cluster", [None] + list(titles), format_func=lambda c: "All clusters" if c is None else titles[c])
+    args = dict(quest_id=quest.id if quest else None, min_sentiment=sent[0] if sent[0] > -1 else None,
+                max_sentiment=sent[1] if sent[1] < 1 else None, min_quality=min_quality or None, cluster_id=cluster)
+    if st.session_state.get("search_args") != (project_id, query, args):   # new search: back to page 1
+        st.session_state["search_args"] = (project_id, query, args)
+        st.session_state["search_page"] = 0
+    page_no = st.session_state["search_page"]
+    res = search(db, project_id, query, page=page_no, **args)
+    if query.strip() and not res["rows"]:
+        st.info("No matching feedback.")
+    for r in res["rows"]:
+        st.markdown(f"**#{r.id}** · quest #{r.quest_id} · quality {round(r.quality_score, 2)} · "
+                    f"sent {round(r.sentiment, 2)}" + (f" · cluster {r.cluster_id}" if r.cluster_id is not None else ""))
+        st.caption(r.snippet)
+    if res["rows"]:
+        cols = st.columns(2)
+        if cols[0].button("← Previous results", disabled=page_no == 0):
+            st.session_state["search_page"] -= 1; st.rerun()
+        if cols[1].button("More results →", disabled=not res["more"]):
+            st.session_state["search_page"] += 1; st.rerun()
+
+def render_feedback_table(quest_id: int):
+    cols = st.columns(4)
+    sort = cols[0].selectbox("Sort", list(repo.FEEDBACK_SORTS), key=f"fb_sort_{quest_id}")
+    min_quality = cols[1].slider("Min quality", 0.0, 1.0, 0.0, 0.05, key=f"fb_minq_{quest_id}")
+    negative_only = cols[2].checkbox("Negative only", key=f"fb_neg_{quest_id}")
+    hide_dups = cols[3].checkbox("Hide duplicates", key=f"fb_dups_{quest_id}")
+    args = dict(sort=sort, min_quality=min_quality or None, negative_only=negative_only, hide_duplicates=hide_dups)
+    state = st.session_state.setdefault(f"fb_pages_{quest_id}", {"args": args, "cursors": [None]})
+    if state["args"] != args:   # new sort/filter: back to the first page
+        state.update(args=args, cursors=[None])
+    cursors = state["cursors"]
+    rows = repo.feedback_page(db, quest_id, after=cursors[-1], **args)
+    if not rows:
+        st.info("No feedback matches these filters.")
+    else:
+        st.dataframe(pd.DataFrame([{
+            "critic": f"#{f.critic_id}",
+            "sent": round(f.sentiment,2),
+            "spec": round(f.specificity,2),
+            "help": round(f.helpfulness,2),
+            "quality": round(f.quality_score,2),
+            "suggestions": "; ".join(f.suggestions or []),
+            "dup of": f"#{f.duplicate_of}" if f.duplicate_of else "",
+            "text": f.text[:160] + ("…" if len(f.text)>160 else "")
+        } for f in rows]), use_container_width=True, hide_index=True)
+    col, _ = repo.FEEDBACK_SORTS[sort]
+    cols = st.columns(2)
+    if cols[0].button("← Previous", key=f"fb_prev_{quest_id}", disabled=len(cursors) == 1):
+        cursors.pop(); st.rerun()
+    if cols[1].button("Next →", key=f"fb_next_{quest_id}", disabled=len(rows) < repo.FEEDBACK_PAGE):
+        cursors.append((getattr(rows[-1], col.key), rows[-1].id)); st.rerun()
 
 # ---- Pages ----
 if page == "Home":
@@ -113,7 +271,7 @@ if page == "Home":
     st.write("")
     st.subheader("Live Projects")
 
-    projects = db.query(Project).all()
+    projects = repo.home_projects(db)
     if not projects:
         st.info("No projects yet.")
     for p in projects:
@@ -129,7 +287,7 @@ if page == "Home":
                 if p.url:
                     st.markdown(f"<p style='text-align:right'><a class='visit' href='{p.url}' target='_blank'>Visit site ↗</a></p>", unsafe_allow_html=True)
             st.markdown("</div>", unsafe_allow_html=True)
-            render_health_gauge(p.id)
+            render_health_gauge(health_value(p.n, p.sentiment_sum))
 
 elif page == "Projects":
     st.header("Projects")
@@ -144,10 +302,10 @@ elif page == "Projects":
                     st.error("Name required.")
                 else:
                     pr = Project(owner_id=me.id, name=name, slug=mk_slug(name), description=desc, url=url or None, tags=[t.strip() for t in tags.split(",") if t.strip()])
-                    db.add(pr); db.commit(); st.success("Project created.")
+                    db.add(pr); bump(db, "projects"); db.commit(); st.success("Project created.")
         st.write("---")
 
-    projs = db.query(Project).all() if me.role=="critic" else db.query(Project).filter_by(owner_id=me.id).all()
+    projs = repo.projects(db, owner_id=None if me.role=="critic" else me.id)
     if not projs:
         st.info("No projects yet.")
     for p in projs:
@@ -166,7 +324,7 @@ elif page == "Projects":
 elif page == "Quests":
     st.header("Feedback Quests")
     if me.role == "founder":
-        my_projects = db.query(Project).filter_by(owner_id=me.id).all()
+        my_projects = repo.projects(db, owner_id=me.id)
         if not my_projects:
             st.info("Create a project first.")
         else:
@@ -183,9 +341,10 @@ elif page == "Quests":
                               tags=[t.strip() for t in tags.split(",") if t.strip()],
                               reward_type=reward_type, reward_value=reward_val,
                               deadline=dt.datetime.combine(deadline, dt.time(23,59)))
-                    db.add(q); db.commit(); st.success("Quest created.")
+                    db.add(q); bump(db, "quests"); db.commit(); st.success("Quest created.")
 
-    quests = db.query(Quest).all() if me.role=="critic" else db.query(Quest).join(Project).filter(Project.owner_id==me.id).all()
+    quests = repo.quests(db, owner_id=None if me.role=="critic" else me.id)
+    stats = repo.quest_stats(db, [q.id for q in quests]) if me.role == "founder" else {}
     for q in quests:
         with st.container():
             st.markdown("<div class='card'>", unsafe_allow_html=True)
@@ -199,46 +358,25 @@ elif page == "Quests":
                         if not text.strip():
                             st.error("Please enter feedback.")
                         else:
-                            s = sentiment_score(text)
-                            g = grade_quality(text)
-                            fixes = instant_fix_suggestions(text)
-                            fb = Feedback(quest_id=q.id, critic_id=me.id, text=text, sentiment=s,
-                                          specificity=g["specificity"], helpfulness=g["helpfulness"],
-                                          quality_score=g["quality"], suggestions=fixes)
-                            db.add(fb); db.commit()
-                            pts = reward_points(g["quality"], q.reward_value)
-                            me.points += pts
-                            me.badges = sample_badges(me.points)
-                            db.commit()
-                            st.success(f"Submitted. Earned {pts} points.")
-            if me.role == "founder":
-                feed = db.query(Feedback).filter_by(quest_id=q.id).order_by(Feedback.created_at.desc()).all()
-                if feed:
-                    df = pd.DataFrame([{
-                        "critic": f"#{f.critic_id}",
-                        "sent": round(f.sentiment,2),
-                        "spec": round(f.specificity,2),
-                        "help": round(f.helpfulness,2),
-                        "quality": round(f.quality_score,2),
-                        "suggestions": "; ".join(f.suggestions or []),
-                        "text": f.text[:160] + ("…" if len(f.text)>160 else "")
-                    } for f in feed])
-                    st.dataframe(df, use_container_width=True, hide_index=True)
+                            submit_and_report(q.id, text)
+            if me.role == "founder" and q.id in stats:
+                s = stats[q.id]
+                cols = st.columns(4)
+                cols[0].metric("Reviews", s.n)
+                cols[1].metric("Avg sentiment", round(s.sentiment, 2))
+                cols[2].metric("Avg quality", round(s.quality, 2))
+                cols[3].metric("Last activity", s.last_at.strftime("%Y-%m-%d %H:%M") if s.last_at else "—")
+                if st.toggle("Show feedback", key=f"show_fb_{q.id}"):
+                    render_feedback_table(q.id)
                     if st.button(f"Cluster & Summarize (quest #{q.id})"):
-                        texts = [f.text for f in feed]
-                        res = cluster_feedback(texts, k=min(6, max(2, len(texts)//3 or 2)))
-                        for f, label in zip(feed, res["labels"]):
-                            f.cluster_id = int(label)
-                        db.commit()
-                        cards = do_next_cards(res["top_terms"])
-                        st.success("Clusters computed.")
-                        for c in cards:
-                            st.info(f"**{c['title']}**\n{c['action']}\nImpact: {c['impact']} · Effort: {c['effort']}")
+                        enqueue(db, q.project_id, q.id)
+                        st.success("Clustering queued.")
+                    render_cluster_summaries(q.project_id, q.id)
             st.markdown("</div>", unsafe_allow_html=True)
 
 elif page == "Feedback":
     st.header("My Feedback")
-    my_fb = db.query(Feedback).filter_by(critic_id=me.id).order_by(Feedback.created_at.desc()).all()
+    my_fb = repo.critic_feedback(db, me.id)
     if not my_fb:
         st.info("You haven't submitted feedback yet.")
     else:
@@ -253,46 +391,101 @@ elif page == "Insights":
     if me.role != "founder":
         st.info("Insights are for founders. Submit feedback to climb the leaderboard!")
     else:
-        my_projects = db.query(Project).filter_by(owner_id=me.id).all()
+        my_projects = repo.projects(db, owner_id=me.id)
         if not my_projects:
             st.info("Create a project first.")
         else:
             p = st.selectbox("Project", my_projects, format_func=lambda x: x.name)
             st.subheader("Impact Meter")
-            render_health_gauge(p.id)
-            all_fb = db.query(Feedback).join(Quest).filter(Quest.project_id==p.id).all()
+            render_health_gauge(project_health(db, [p.id]).get(p.id))
+            st.subheader("Trends")
+            render_trends(p.id)
+            force = st.checkbox("Force full refit", value=False)
             if st.button("Recompute clusters across project"):
-                texts = [f.text for f in all_fb]
-                res = cluster_feedback(texts, k=min(8, max(2, len(texts)//4 or 2)))
-                for f, label in zip(all_fb, res["labels"]):
-                    f.cluster_id = int(label)
-                db.commit()
-                cards = do_next_cards(res["top_terms"])
-                st.success("Project clusters updated.")
-                for c in cards:
-                    st.info(f"**{c['title']}**\n{c['action']}\nImpact: {c['impact']} · Effort: {c['effort']}")
+                enqueue(db, p.id, force=force)
+                st.success("Project clustering queued.")
+            render_cluster_summaries(p.id)
+            st.subheader("Search")
+            render_search(p.id)
 
 elif page == "Leaderboards":
     st.header("Leaderboards")
-    critics = db.query(User).filter_by(role="critic").order_by(User.points.desc()).all()
-    if not critics:
-        st.info("No critics yet. Encourage signups!")
-    else:
-        df = pd.DataFrame([{"critic": c.name or c.email, "points": c.points, "streak": c.streak, "badges": ", ".join(c.badges or [])} for c in critics])
-        st.dataframe(df, use_container_width=True, hide_index=True)
+    if me.role == "critic":
+        rank, total = leaderboard.rank_of(db, me.id)
+        st.metric("Your rank", f"#{rank} of {total}", help=f"{me.points} points")
+    tab_all, tab_week, tab_month = st.tabs(["All time", "This week", "This month"])
+    with tab_all:
+        cursors = st.session_state.setdefault("lb_cursors", [None])
+        after = cursors[-1]
+        critics = leaderboard.top_n(db, leaderboard.PAGE_SIZE) if after is None else leaderboard.page(db, after)
+        if not critics:
+            st.info("No critics yet. Encourage signups!")
+        else:
+            df = pd.DataFrame([{"critic": c.name or c.email, "points": c.points, "streak": c.streak, "badges": ", ".join(c.badges or [])} for c in critics])
+            st.dataframe(df, use_container_width=True, hide_index=True)
+        cols = st.columns(2)
+        if cols[0].button("← Previous", disabled=len(cursors) == 1):
+            cursors.pop(); st.rerun()
+        if cols[1].button("Next →", disabled=len(critics) < leaderboard.PAGE_SIZE):
+            cursors.append((critics[-1].points, critics[-1].id)); st.rerun()
+    for tab, period in ((tab_week, "week"), (tab_month, "month")):
+        with tab:
+            rows = leaderboard.period_page(db, period)
+            if not rows:
+                st.info(f"No points earned this {period} yet.")
+            else:
+                st.dataframe(pd.DataFrame([{"critic": r.name or r.email, "points": r.points} for r in rows]),
+                             use_container_width=True, hide_index=True)
 
 elif page == "Raids":
     st.header("Feedback Raids (sprints)")
-    st.write("Schedule a 30-minute sprint to gather 10+ reviews fast. Demo only.")
+    st.write("A 30-minute sprint to gather 10+ reviews fast. Feedback sent while a raid is live earns boosted points.")
+    now = dt.datetime.utcnow()
     if me.role == "founder":
-        with st.form("raid_form"):
-            title = st.text_input("Raid name", value="Honest Hour — Onboarding")
-            when = st.date_input("Date", value=dt.date.today() + dt.timedelta(days=1))
-            time = st.time_input("Time", value=dt.time(17, 0))
-            min_reviewers = st.number_input("Min reviewers", 5, 50, 10)
-            reward_boost = st.slider("Reward boost ×", 1.0, 3.0, 1.5, 0.1)
-            if st.form_submit_button("Create Raid"):
-                st.success(f"Raid scheduled: {title} on {when} at {time}. Reward boost ×{reward_boost}. (Demo)")
+        my_quests = repo.quests(db, owner_id=me.id)
+        if not my_quests:
+            st.info("Create a quest first.")
+        else:
+            with st.form("raid_form"):
+                quest = st.selectbox("Quest", my_quests, format_func=lambda x: x.title)
+                title = st.text_input("Raid name", value="Honest Hour — Onboarding")
+                when = st.date_input("Date (UTC)", value=dt.date.today() + dt.timedelta(days=1))
+                time = st.time_input("Time (UTC)", value=dt.time(17, 0))
+                minutes = st.number_input("Duration (minutes)", 5, 240, 30)
+                min_reviewers = st.number_input("Min reviewers", 5, 50, 10)
+                reward_boost = st.slider("Reward boost ×", 1.0, 3.0, 1.5, 0.1)
+                if st.form_submit_button("Create Raid"):
+                    raids.create_raid(db, quest.id, title, dt.datetime.combine(when, time), int(minutes),
+                                      int(min_reviewers), reward_boost)
+                    st.success(f"Raid scheduled: {title} on {when} at {time}. Reward boost ×{reward_boost}.")
+        mine = {q.id for q in my_quests}
+        shown = [r for r in raids.open_raids(db) if r.quest_id in mine and r.ends_at > now]
+    else:
+        shown = [r for r in raids.open_raids(db) if r.ends_at > now]
+    if not shown:
+        st.info("No live or upcoming raids.")
+    titles = {q.id: q.title for q in repo.quests(db, owner_id=None)} if shown else {}
+    for r in shown:
+        live = r.starts_at <= now
+        with st.container():
+            st.markdown("<div class='card'>", unsafe_allow_html=True)
+            st.subheader(f"{'🔴 Live' if live else 'Upcoming'} · {r.title}")
+            st.caption(f"Quest: {titles.get(r.quest_id, r.quest_id)} · {r.starts_at:%Y-%m-%d %H:%M}–{r.ends_at:%H:%M} UTC · "
+                       f"Goal: {r.min_reviewers} reviewers · Boost ×{r.reward_boost:g}")
+            render_raid_counts(r.id, r.min_reviewers)
+            if me.role == "critic" and live:
+                with st.form(f"raid_{r.id}"):
+                    text = st.text_area("Your feedback", height=140, key=f"raidtext{r.id}")
+                    if st.form_submit_button("Submit feedback"):
+                        if not text.strip():
+                            st.error("Please enter feedback.")
+                        else:
+                            submit_and_report(r.quest_id, text)
+            st.markdown("</div>", unsafe_allow_html=True)
+
+metrics.end_rerun(page)
+db.close()
+start_warm_up()
 
 st.sidebar.write("---")
 if st.sidebar.button("Sign out"):
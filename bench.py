@@ -0,0 +1,302 @@
+from __future__ import annotations
+import os, sys, json, time, random, argparse, platform, tempfile, statistics, subprocess, datetime as dt
+from typing import Callable, Dict, Any, List
+
+# Benchmarks run against their own SQLite file unless --db / DATABASE_URL says otherwise;
+# db.py reads DATABASE_URL at import time, so it must be set before the app modules load.
+
+def timeit(fn: Callable[[], Any], repeat: int = 3) -> Dict[str, float]:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {"min_s": round(min(runs), 6), "median_s": round(statistics.median(runs), 6)}
+
+def guarded(fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    try:
+        return fn()
+    except LookupError as e:   # e.g. VADER lexicon not downloaded
+        return {"error": str(e).strip().splitlines()[0]}
+
+HEAVY = ("sklearn", "scipy", "nltk", "plotly")
+IMPORT_PROBES = {"db": "import db", "repo": "import repo", "leaderboard": "import leaderboard",
+                 "feedback": "import feedback", "jobs": "import jobs", "ai": "import ai",
+                 "ai_warm_up": "import ai; ai.warm_up()"}
+_PROBE = ("import sys, json, time; t = time.perf_counter(); {stmt}; "
+          "print(json.dumps([time.perf_counter() - t, [m for m in {heavy!r} if m in sys.modules]]))")
+
+def bench_imports(repeat: int = 3) -> Dict[str, Any]:
+    """Cold import time per app module, each in a fresh interpreter, plus which heavy packages it dragged in.
+    Only `ai_warm_up` should list sklearn/scipy/nltk."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = {}
+    for name, stmt in IMPORT_PROBES.items():
+        runs, heavy = [], []
+        for _ in range(repeat):
+            proc = subprocess.run([sys.executable, "-c", _PROBE.format(stmt=stmt, heavy=HEAVY)], cwd=here,
+                                  capture_output=True, text=True, check=True)
+            seconds, heavy = json.loads(proc.stdout.strip().splitlines()[-1])
+            runs.append(seconds)
+        out[name] = {"min_s": round(min(runs), 6), "median_s": round(statistics.median(runs), 6), "heavy": heavy}
+    return out
+
+def bench_scoring(texts: List[str]) -> Dict[str, Any]:
+    """`sentiment_uncached` is the old one-text-at-a-time path; `sentiment_scores_disk` clears the LRU before each run."""
+    from ai import sentiment_scores, score_uncached, grade_quality, grade_quality_batch, _sentiment_cache
+    out: Dict[str, Any] = {"n": len(texts)}
+    out["sentiment_uncached"] = guarded(lambda: timeit(lambda: score_uncached(texts)))
+    out["sentiment_parallel"] = guarded(lambda: timeit(lambda: score_uncached(texts, processes=None), repeat=1))
+    out["sentiment_scores_warm"] = guarded(lambda: timeit(lambda: sentiment_scores(texts)))
+    out["sentiment_scores_disk"] = guarded(lambda: timeit(lambda: (_sentiment_cache().lru.clear(), sentiment_scores(texts))))
+    out["grade_quality"] = timeit(lambda: [grade_quality(t) for t in texts])
+    out["grade_quality_batch"] = timeit(lambda: grade_quality_batch(texts))
+    for key in ("sentiment_uncached", "sentiment_parallel", "sentiment_scores_warm", "sentiment_scores_disk",
+                "grade_quality", "grade_quality_batch"):
+        if "median_s" in out[key]:
+            out[key]["texts_per_s"] = round(len(texts) / out[key]["median_s"], 1)
+    return out
+
+def bench_clustering(texts: List[str], sizes: List[int], ks: List[int]) -> Dict[str, Any]:
+    from ai import cluster_feedback, term_counts, assign_clusters, ClusterState
+    results = {}
+    for n in sizes:
+        corpus = texts[:n]
+        X = term_counts(corpus)
+        for k in ks:
+            state = ClusterState()
+            fit = timeit(lambda: cluster_feedback(X, k=k, state=ClusterState()), repeat=1)
+            cluster_feedback(X, k=k, state=state)
+            inc = timeit(lambda: assign_clusters(X[:100], state), repeat=3)
+            results[f"n{len(corpus)}_k{k}"] = {"full_fit": fit, "assign_100": inc,
+                                               "text_fit": timeit(lambda: cluster_feedback(corpus, k=k), repeat=1)}
+    return results
+
+def bench_queries(repeat: int = 5) -> Dict[str, Any]:
+    import repo, health, leaderboard, search, rollups
+    from db import SessionLocal, Project, User
+    db = SessionLocal()
+    try:
+        pid, founder_id = db.query(Project.id, Project.owner_id).order_by(Project.id.desc()).first()
+        critic = db.query(User).filter_by(role="critic").order_by(User.id.desc()).first()
+        owned = [q.id for q in repo.quests.uncached(db, founder_id)]
+        return {
+            "home": timeit(lambda: repo.home_projects.uncached(db), repeat),
+            "projects": timeit(lambda: repo.projects.uncached(db), repeat),
+            "quests_founder": timeit(lambda: (repo.quests.uncached(db, founder_id),
+                                              repo.quest_stats.uncached(db, owned)), repeat),
+            "quest_feedback_page": timeit(lambda: repo.feedback_page.uncached(db, owned[0]), repeat),
+            "feedback_critic": timeit(lambda: repo.critic_feedback.uncached(db, critic.id), repeat),
+            "insights_health": timeit(lambda: health.project_health.uncached(db, [pid]), repeat),
+            "leaderboard_top": timeit(lambda: leaderboard.page(db, limit=leaderboard.TOP_N), repeat),
+            "leaderboard_rank": timeit(lambda: leaderboard.rank_of(db, critic.id), repeat),
+            "trend_year_daily": timeit(lambda: rollups.series.uncached(db, pid, "day", dt.datetime(2025, 1, 1)), repeat),
+            "search": timeit(lambda: search.search.uncached(db, pid, "subscription toggle"), repeat),
+            "search_filtered": timeit(lambda: search.search.uncached(db, pid, "checkout", min_quality=0.5,
+                                                                     min_sentiment=0.0, page=2), repeat),
+        }
+    finally:
+        db.close()
+
+def bench_ingest(n: int, workers: int | None) -> Dict[str, Any]:
+    import seed, ingest
+    from db import SessionLocal, Quest, User
+    db = SessionLocal()
+    quest_ids = [q for q, in db.query(Quest.id).all()]
+    critic_ids = [u for u, in db.query(User.id).filter_by(role="critic").all()]
+    db.close()
+    path = os.path.join(tempfile.mkdtemp(prefix="iterrate-bench-"), "feedback.jsonl")
+    with open(path, "w", encoding="utf-8") as fh:
+        for r in seed.feedback_records(n, quest_ids, critic_ids, seed=7):
+            fh.write(json.dumps(r) + "\n")
+    return ingest.ingest_file(path, workers=workers, log=lambda _: None)
+
+def _contend(args):
+    quest_ids, critic_ids, n, seed_ = args
+    import random as _random
+    from sqlalchemy.exc import OperationalError
+    from db import engine, SessionLocal
+    from feedback import submit_feedback
+    from dedup import DuplicateFeedback
+    import seed
+    engine.dispose(close=False)   # forked child: never reuse the parent's pooled connections
+    rng = _random.Random(seed_)
+    failed = duplicates = 0
+    db = SessionLocal()
+    for _ in range(n):
+        try:
+            submit_feedback(db, rng.choice(quest_ids), rng.choice(critic_ids), seed.feedback_text(rng))
+        except OperationalError:
+            db.rollback()
+            failed += 1
+        except DuplicateFeedback:
+            duplicates += 1
+    db.close()
+    return failed, duplicates
+
+def bench_contention(processes: int, per_process: int) -> Dict[str, Any]:
+    """Concurrent writers from separate processes; `failed` counts 'database is locked' style errors."""
+    import multiprocessing as mp
+    from db import SessionLocal, Quest, User
+    db = SessionLocal()
+    quest_ids = [q for q, in db.query(Quest.id).all()]
+    critic_ids = [u for u, in db.query(User.id).filter_by(role="critic").all()]
+    db.close()
+    start = time.perf_counter()
+    with mp.get_context("fork").Pool(processes) as pool:
+        outcomes = pool.map(_contend, [(quest_ids, critic_ids, per_process, i) for i in range(processes)])
+    seconds = time.perf_counter() - start
+    writes = processes * per_process
+    failed, duplicates = (sum(col) for col in zip(*outcomes))
+    return {"processes": processes, "writes": writes, "failed": failed, "duplicates": duplicates,
+            "seconds": round(seconds, 3), "writes_per_sec": round((writes - failed - duplicates) / seconds, 1)}
+
+def bench_rescore() -> Dict[str, Any]:
+    """Rescore the largest project. Sentiments were cached when the rows were seeded, so this is the rule pass,
+    the cache lookups and the change detection; nothing moved, so nothing is written."""
+    from sqlalchemy import func
+    from db import SessionLocal, Quest, Feedback
+    from rescore import rescore_project
+    db = SessionLocal()
+    try:
+        pid = db.query(Quest.project_id).join(Feedback).group_by(Quest.project_id) \
+            .order_by(func.count(Feedback.id).desc()).first()[0]
+        return rescore_project(db, pid)
+    finally:
+        db.close()
+
+def bench_raid(reviewers: int, per_reviewer: int) -> Dict[str, Any]:
+    """A raid burst: `reviewers` threads (one per Streamlit session) each submit as fast as they can while a raid
+    is live. Submissions go through the write buffer; `direct` repeats the burst with one commit per review."""
+    import threading, seed, raids, ai
+    from concurrent.futures import ThreadPoolExecutor
+    from sqlalchemy import func
+    from db import SessionLocal, Quest, User, Feedback
+    from feedback import submit_feedback
+    from dedup import DuplicateFeedback
+    db = SessionLocal()
+    quest_id = db.query(Quest.id).order_by(Quest.id).first()[0]
+    critic_ids = [u for u, in db.query(User.id).filter_by(role="critic").limit(reviewers).all()]
+    raid = raids.create_raid(db, quest_id, "bench", dt.datetime.utcnow() - dt.timedelta(minutes=1), 60, reward_boost=2.0)
+    raid_id = raid.id
+    db.close()
+
+    def burst(send, seed_: int) -> Dict[str, Any]:
+        latencies, errors, lock = [], [], threading.Lock()
+        duplicates = 0
+        def reviewer(i):
+            nonlocal duplicates
+            rng, s = random.Random(seed_ * 100003 + i), SessionLocal()
+            try:
+                for _ in range(per_reviewer):
+                    t = time.perf_counter()
+                    try:
+                        send(s, critic_ids[i % len(critic_ids)], seed.feedback_text(rng))
+                    except DuplicateFeedback:
+                        with lock:
+                            duplicates += 1
+                    except Exception as e:
+                        s.rollback()
+                        with lock:
+                            errors.append(type(e).__name__)
+                    with lock:
+                        latencies.append(time.perf_counter() - t)
+            finally:
+                s.close()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(reviewers) as pool:
+            list(pool.map(reviewer, range(reviewers)))
+        seconds = time.perf_counter() - start
+        latencies.sort()
+        return {"submissions": len(latencies), "errors": len(errors), "duplicates": duplicates, "seconds": round(seconds, 3),
+                "per_sec": round(len(latencies) / seconds, 1),
+                "p50_ms": round(1000 * latencies[len(latencies) // 2], 1),
+                "p95_ms": round(1000 * latencies[int(len(latencies) * 0.95)], 1)}
+
+    ai.warm_up()            # neither path should pay for the lexicon load
+    buf = raids.buffer()
+    raids.counts(raid_id)   # seed the live counter before the burst, as the Raids page would
+    flushes, rows = buf.flushes, buf.rows
+    out = {"reviewers": reviewers, "per_reviewer": per_reviewer,
+           "buffered": burst(lambda s, c, text: raids.submit(s, quest_id, c, text), 1)}
+    out["buffered"].update(flushes=buf.flushes - flushes,
+                           avg_batch=round((buf.rows - rows) / max(1, buf.flushes - flushes), 1))
+    db = SessionLocal()
+    stored = db.query(func.count(Feedback.id)).filter(Feedback.raid_id == raid_id).scalar()
+    db.close()
+    out["counter"] = {"live": raids.counts(raid_id)["submissions"], "stored": stored}
+    out["direct"] = burst(lambda s, c, text: submit_feedback(s, quest_id, c, text), 2)
+    return out
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], path: str = "") -> List[str]:
+    """Lines for every median that moved by more than 10% against a previous run."""
+    lines = []
+    for key, value in current.items():
+        other = baseline.get(key) if isinstance(baseline, dict) else None
+        if isinstance(value, dict) and isinstance(other, dict):
+            if "median_s" in value and "median_s" in other and other["median_s"]:
+                ratio = value["median_s"] / other["median_s"]
+                if abs(ratio - 1) > 0.10:
+                    lines.append(f"{path}{key}: {other['median_s']:.4f}s -> {value['median_s']:.4f}s (x{ratio:.2f})")
+            else:
+                lines += compare(value, other, f"{path}{key}.")
+    return lines
+
+def main(argv: List[str] | None = None) -> Dict[str, Any]:
+    ap = argparse.ArgumentParser(description="IterRate benchmark suite; prints JSON.")
+    ap.add_argument("--db", help="database URL (default: a fresh temporary SQLite file)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--critics", type=int, default=500)
+    ap.add_argument("--projects", type=int, default=10)
+    ap.add_argument("--feedback", type=int, default=5000, help="rows generated for the query benchmarks")
+    ap.add_argument("--texts", type=int, default=2000, help="texts for the scoring benchmarks")
+    ap.add_argument("--sizes", default="500,2000", help="corpus sizes for clustering")
+    ap.add_argument("--ks", default="4,8")
+    ap.add_argument("--ingest", type=int, default=2000, help="rows for the ingestion benchmark (0 to skip)")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--contention", type=int, default=8, help="concurrent writer processes (0 to skip)")
+    ap.add_argument("--writes", type=int, default=50, help="submissions per writer process")
+    ap.add_argument("--raid", type=int, default=50, help="concurrent reviewers in the raid burst (0 to skip)")
+    ap.add_argument("--raid-writes", type=int, default=10, help="submissions per raid reviewer")
+    ap.add_argument("--out", help="write results to this file as well as stdout")
+    ap.add_argument("--baseline", help="previous results JSON to compare against")
+    args = ap.parse_args(argv)
+    os.environ["DATABASE_URL"] = args.db or os.environ.get("ITERRATE_BENCH_DB") or \
+        "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="iterrate-bench-"), "bench.db")
+    os.environ["ITERRATE_SENTIMENT_CACHE"] = os.path.join(tempfile.mkdtemp(prefix="iterrate-bench-"), "sentiment.db")
+
+    import seed
+    rng = random.Random(args.seed)
+    texts = [seed.feedback_text(rng) for _ in range(max(args.texts, max(int(s) for s in args.sizes.split(","))))]
+    results: Dict[str, Any] = {
+        "meta": {"timestamp": dt.datetime.utcnow().isoformat(), "python": sys.version.split()[0],
+                 "platform": platform.platform(), "args": vars(args)},
+    }
+    results["imports"] = bench_imports()
+    results["scoring"] = bench_scoring(texts[:args.texts])
+    results["clustering"] = bench_clustering(texts, [int(s) for s in args.sizes.split(",")],
+                                             [int(k) for k in args.ks.split(",")])
+    results["seed"] = guarded(lambda: timeit(lambda: seed.generate(critics=args.critics, projects=args.projects,
+                                                                   feedback=args.feedback, seed=args.seed), 1))
+    if "error" not in results["seed"]:
+        results["queries"] = bench_queries()
+        if args.ingest:
+            results["ingest"] = guarded(lambda: bench_ingest(args.ingest, args.workers))
+        if args.contention:
+            results["contention"] = bench_contention(args.contention, args.writes)
+        results["rescore"] = guarded(lambda: bench_rescore())
+        if args.raid:
+            results["raid"] = guarded(lambda: bench_raid(args.raid, args.raid_writes))
+    payload = json.dumps(results, indent=2, default=str)
+    print(payload)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(payload)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            for line in compare(results, json.load(fh)):
+                print(line, file=sys.stderr)
+    return results
+
+if __name__ == "__main__":
+    main()
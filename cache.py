@@ -0,0 +1,88 @@
+from __future__ import annotations
+import time, threading, functools
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Iterable, List
+
+from db import versions
+
+# One process-wide store shared by every Streamlit session on this server. Entries are keyed on the
+# current values of the version counters they depend on (db.bump on writes), so a write makes the old
+# entry unreachable immediately; LRU size and TTL only bound memory.
+MAX_ENTRIES = 1024
+DEFAULT_TTL = 600.0
+
+class _Store:
+    def __init__(self, maxsize: int = MAX_ENTRIES):
+        self.maxsize = maxsize
+        self.data: OrderedDict = OrderedDict()     # key -> (expires_at, value)
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0, "evictions": 0})
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, namespace: str, key, compute: Callable[[], Any], ttl: float):
+        now = time.monotonic()
+        with self.lock:
+            hit = self.data.get(key)
+            if hit is not None and hit[0] > now:
+                self.data.move_to_end(key)
+                self.stats[namespace]["hits"] += 1
+                return hit[1]
+            self.stats[namespace]["misses"] += 1
+        value = compute()
+        with self.lock:
+            self.data[key] = (now + ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                old_key, _ = self.data.popitem(last=False)
+                self.stats[old_key[0]]["evictions"] += 1
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+STORE = _Store()
+_RESOURCES: Dict[str, Any] = {}
+_RESOURCE_LOCK = threading.Lock()
+
+def _freeze(value):
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+def cached(namespace: str, keys: Callable[..., Iterable[str]] = lambda *a, **k: (), ttl: float = DEFAULT_TTL):
+    """Cache `fn(db, *args)` on its arguments plus the current values of the version counters named by
+    `keys(*args)`. Values must be immutable/plain data (Rows, dicts), never session-bound ORM objects."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(db, *args, **kwargs):
+            vkeys = list(keys(*args, **kwargs))
+            current = versions(db, *vkeys) if vkeys else {}
+            key = (namespace, _freeze(args), _freeze(kwargs), _freeze(current))
+            return STORE.get_or_compute(namespace, key, lambda: fn(db, *args, **kwargs), ttl)
+        wrapper.uncached = fn
+        return wrapper
+    return deco
+
+def resource(name: str, factory: Callable[[], Any]):
+    """Heavy shared objects (VADER lexicon, cluster states) built once per server process."""
+    with _RESOURCE_LOCK:
+        if name in _RESOURCES:
+            STORE.stats[f"resource:{name}"]["hits"] += 1
+        else:
+            STORE.stats[f"resource:{name}"]["misses"] += 1
+            _RESOURCES[name] = factory()
+        return _RESOURCES[name]
+
+def stats() -> List[Dict[str, Any]]:
+    with STORE.lock:
+        sizes: Dict[str, int] = defaultdict(int)
+        for key in STORE.data:
+            sizes[key[0]] += 1
+        rows = []
+        for ns, s in sorted(STORE.stats.items()):
+            total = s["hits"] + s["misses"]
+            rows.append({"cache": ns, **s, "entries": sizes.get(ns, int(ns.startswith("resource:"))),
+                         "hit_rate": round(s["hits"] / total, 3) if total else 0.0})
+        return rows
@@ -0,0 +1,110 @@
+from __future__ import annotations
+import datetime as dt
+from typing import Dict, List, Any
+from sqlalchemy import select, update
+
+from db import ClusterModel, Feedback, Quest, bump
+from ai import ClusterState, cluster_feedback, assign_clusters, term_counts
+from features import store_features, load_matrix, backfill_features
+from cache import resource
+from rollups import relabel as relabel_rollups
+
+# project_id -> (ClusterModel.version, ClusterState); avoids re-inflating centroids on every insert
+_STATES: Dict[int, tuple[int, ClusterState]] = resource("cluster_states", dict)
+
+def default_k(n: int) -> int:
+    return min(8, max(2, n // 4 or 2))
+
+def load_state(db, project_id: int) -> ClusterState:
+    row = db.execute(select(ClusterModel.version).filter_by(project_id=project_id)).first()
+    if row is None:
+        return ClusterState()
+    cached = _STATES.get(project_id)
+    if cached and cached[0] == row.version:
+        return cached[1]
+    blob = db.execute(select(ClusterModel.state).filter_by(project_id=project_id)).scalar()
+    state = ClusterState.from_bytes(blob) if blob else ClusterState()
+    _STATES[project_id] = (row.version, state)
+    return state
+
+def save_state(db, project_id: int, state: ClusterState, refit: bool = False):
+    model = db.query(ClusterModel).filter_by(project_id=project_id).first()
+    if model is None:
+        model = ClusterModel(project_id=project_id, version=0)
+        db.add(model)
+    now = dt.datetime.utcnow()
+    model.k = len(state.ids)
+    model.version = (model.version or 0) + 1
+    model.state = state.to_bytes()
+    model.updated_at = now
+    if refit:
+        model.refit_at = now
+    db.flush()
+    _STATES[project_id] = (model.version, state)
+
+def index_feedback(db, project_id: int, ids: List[int], texts: List[str],
+                   duplicate_of: List[int | None] | None = None) -> List[int | None]:
+    """Vectorize freshly inserted rows once into the feature store and place them into the
+    project's existing clusters. Near-duplicates (per `duplicate_of`) take their original's cluster
+    without moving any centroid. Returns their cluster ids, or [] until the first fit."""
+    if not ids:
+        return []
+    state = load_state(db, project_id)
+    n_terms = len(state.vocab)
+    X = term_counts(texts, state.vocab)
+    store_features(db, project_id, ids, X)
+    learned = len(state.vocab) > n_terms   # term names are only recorded here, so they must be saved even pre-fit
+    if not state.fitted:
+        if learned:
+            save_state(db, project_id, state)
+        return []
+    duplicate_of = duplicate_of or [None] * len(ids)
+    keep = [i for i, d in enumerate(duplicate_of) if d is None]
+    labels: Dict[int, int | None] = {}
+    if keep:
+        labels = {ids[i]: int(cid) for i, cid in zip(keep, assign_clusters(X[keep], state))}
+    if keep or learned:
+        save_state(db, project_id, state)
+    missing = {d for d in duplicate_of if d is not None and d not in labels}
+    if missing:
+        labels.update(db.execute(select(Feedback.id, Feedback.cluster_id).where(Feedback.id.in_(missing))).all())
+    return [labels[fid] if d is None else labels.get(d) for fid, d in zip(ids, duplicate_of)]
+
+def recluster(db, project_id: int, force: bool = False) -> Dict[str, Any]:
+    """Refit only when drift crosses the threshold; otherwise assign whatever is still unclustered.
+    Works off the feature store, so feedback text is only read for rows that predate it."""
+    state = load_state(db, project_id)
+    backfill_features(db, project_id, state.vocab)
+    rows = db.execute(select(Feedback.id, Feedback.cluster_id, Feedback.duplicate_of)
+                      .join(Quest).where(Quest.project_id == project_id)).all()
+    if not rows:
+        return {"labels": {}, "top_terms": {}}
+    labels = {fid: cid for fid, cid, _ in rows}
+    copies = {fid: original for fid, _, original in rows if original is not None}
+    if force or state.needs_refit():
+        ids, X = load_matrix(db, project_id, originals_only=True)
+        if ids and not state.vocab:   # states saved while pre-fit term names were being dropped
+            for start in range(0, len(ids), 2000):
+                part = ids[start:start + 2000]
+                term_counts(db.execute(select(Feedback.text).where(Feedback.id.in_(part))).scalars().all(), state.vocab)
+        res = cluster_feedback(X, k=default_k(len(ids)), state=state)
+        refit = True
+    else:
+        ids, X = load_matrix(db, project_id, [fid for fid, cid in labels.items() if cid is None and fid not in copies])
+        res = {"labels": assign_clusters(X, state)}
+        refit = False
+    changed = {fid: int(cid) for fid, cid in zip(ids, res["labels"]) if fid in labels and labels[fid] != cid}
+    # near-duplicates follow their original so a few pasted copies can't pull a centroid toward themselves
+    for fid, original in copies.items():
+        cid = changed.get(original, labels.get(original))
+        if cid is not None and labels[fid] != cid:
+            changed[fid] = cid
+    if changed:
+        db.execute(update(Feedback), [{"id": fid, "cluster_id": cid} for fid, cid in changed.items()])
+        relabel_rollups(db, project_id, {fid: (labels[fid], cid) for fid, cid in changed.items()})
+    labels.update(changed)
+    save_state(db, project_id, state, refit=refit)
+    if changed:
+        bump(db, f"project:{project_id}")
+    db.commit()
+    return {"labels": labels, "top_terms": state.top_terms()}
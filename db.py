@@ -1,12 +1,45 @@
 
 from __future__ import annotations
 import os, datetime as dt
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Float, ForeignKey, JSON
+from sqlalchemy import create_engine, inspect, text, select, update, insert, Column, Integer, BigInteger, String, Text, Date, DateTime, Float, Boolean, ForeignKey, JSON, LargeBinary, Index
+from sqlalchemy import event, make_url
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from metrics import instrument_engine
 
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///iterate.db")
 
-engine = create_engine(DATABASE_URL, echo=False, future=True)
+POOL_SIZE = int(os.environ.get("ITERRATE_DB_POOL_SIZE", "8"))
+MAX_OVERFLOW = int(os.environ.get("ITERRATE_DB_MAX_OVERFLOW", "8"))
+POOL_RECYCLE = int(os.environ.get("ITERRATE_DB_POOL_RECYCLE", "1800"))      # seconds
+SQLITE_BUSY_MS = int(os.environ.get("ITERRATE_SQLITE_BUSY_MS", "10000"))
+SQLITE_MMAP = int(os.environ.get("ITERRATE_SQLITE_MMAP", str(256 * 1024 * 1024)))
+
+def _sqlite_pragmas(dbapi_conn, _record):
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")        # readers stop blocking the writer
+    cur.execute("PRAGMA synchronous=NORMAL")      # safe with WAL, one fsync per checkpoint
+    cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_MS}")
+    cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP}")
+    cur.close()
+
+def make_engine(url: str = DATABASE_URL):
+    u = make_url(url)
+    if u.get_backend_name() == "sqlite":
+        if u.database in (None, "", ":memory:"):
+            eng = create_engine(url, future=True, poolclass=StaticPool, connect_args={"check_same_thread": False})
+        else:
+            eng = create_engine(url, future=True, poolclass=QueuePool, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                                connect_args={"timeout": SQLITE_BUSY_MS / 1000, "check_same_thread": False})
+            event.listen(eng, "connect", _sqlite_pragmas)
+    else:   # postgres & friends
+        eng = create_engine(url, future=True, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                            pool_pre_ping=True, pool_recycle=POOL_RECYCLE, pool_timeout=30)
+    instrument_engine(eng)
+    return eng
+
+engine = make_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
@@ -25,6 +58,8 @@ class User(Base):
     projects = relationship("Project", back_populates="owner")
     feedback = relationship("Feedback", back_populates="critic")
 
+    __table_args__ = (Index("ix_users_role_points", "role", "points"),)
+
 class Project(Base):
     __tablename__ = "projects"
     id = Column(Integer, primary_key=True)
@@ -39,6 +74,8 @@ class Project(Base):
     owner = relationship("User", back_populates="projects")
     quests = relationship("Quest", back_populates="project", cascade="all, delete-orphan")
 
+    __table_args__ = (Index("ix_projects_owner", "owner_id"),)
+
 class Quest(Base):
     __tablename__ = "quests"
     id = Column(Integer, primary_key=True)
@@ -55,6 +92,21 @@ class Quest(Base):
     project = relationship("Project", back_populates="quests")
     feedback = relationship("Feedback", back_populates="quest", cascade="all, delete-orphan")
 
+    __table_args__ = (Index("ix_quests_project", "project_id"),)
+
+class Raid(Base):
+    __tablename__ = "raids"
+    id = Column(Integer, primary_key=True)
+    quest_id = Column(Integer, ForeignKey("quests.id"), nullable=False)
+    title = Column(String, nullable=False)
+    starts_at = Column(DateTime, nullable=False)
+    ends_at = Column(DateTime, nullable=False)
+    min_reviewers = Column(Integer, default=10)
+    reward_boost = Column(Float, default=1.0)       # multiplies reward_points for feedback sent during the raid
+    created_at = Column(DateTime, default=dt.datetime.utcnow)
+
+    __table_args__ = (Index("ix_raids_ends", "ends_at"),)
+
 class Feedback(Base):
     __tablename__ = "feedback"
     id = Column(Integer, primary_key=True)
@@ -67,11 +119,20 @@ class Feedback(Base):
     quality_score = Column(Float, default=0.0)       # composite
     cluster_id = Column(Integer, nullable=True)
     suggestions = Column(JSON, default=list)         # "Instant Fix-It"
+    duplicate_of = Column(Integer, ForeignKey("feedback.id"), nullable=True)   # earliest near-copy, see dedup.py
+    raid_id = Column(Integer, ForeignKey("raids.id"), nullable=True)          # submitted during this raid
     created_at = Column(DateTime, default=dt.datetime.utcnow)
 
     quest = relationship("Quest", back_populates="feedback")
     critic = relationship("User", back_populates="feedback")
 
+    __table_args__ = (
+        Index("ix_feedback_quest_created", "quest_id", "created_at"),
+        Index("ix_feedback_quest_quality", "quest_id", "quality_score"),
+        Index("ix_feedback_raid", "raid_id"),
+        Index("ix_feedback_critic_created", "critic_id", "created_at"),
+    )
+
 class ClusterSummary(Base):
     __tablename__ = "cluster_summaries"
     id = Column(Integer, primary_key=True)
@@ -83,6 +144,198 @@ class ClusterSummary(Base):
     do_next = Column(JSON, default=list)     # [{action, impact, effort}]
     updated_at = Column(DateTime, default=dt.datetime.utcnow)
 
+    __table_args__ = (Index("ix_cluster_summaries_scope", "project_id", "quest_id", "cluster_id"),)
+
+class ClusterModel(Base):
+    __tablename__ = "cluster_models"
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), unique=True, nullable=False)
+    k = Column(Integer, default=0)
+    version = Column(Integer, default=0)     # bumped on every save; lets processes skip re-loading state
+    state = Column(LargeBinary, nullable=True)   # ai.ClusterState.to_bytes()
+    refit_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=dt.datetime.utcnow)
+
+class FeedbackFeature(Base):
+    __tablename__ = "feedback_features"
+    feedback_id = Column(Integer, ForeignKey("feedback.id", ondelete="CASCADE"), primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
+    indices = Column(LargeBinary, nullable=False)   # int32 hashed term ids (ai.N_FEATURES space)
+    counts = Column(LargeBinary, nullable=False)    # uint16 raw term counts, aligned with indices
+
+class FeedbackSignature(Base):
+    __tablename__ = "feedback_signatures"
+    feedback_id = Column(Integer, ForeignKey("feedback.id", ondelete="CASCADE"), primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    critic_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    signature = Column(LargeBinary, nullable=False)   # uint32 MinHash values (dedup.NUM_PERM)
+
+class LshBucket(Base):
+    __tablename__ = "lsh_buckets"
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    critic_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(BigInteger, nullable=False)           # hash of one signature band
+    feedback_id = Column(Integer, ForeignKey("feedback.id", ondelete="CASCADE"), nullable=False)
+
+    __table_args__ = (Index("ix_lsh_key", "project_id", "key", "critic_id"),)
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False, default="cluster")
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    quest_id = Column(Integer, ForeignKey("quests.id"), nullable=True)
+    dedupe_key = Column(String, nullable=False)      # "cluster:<project>:<quest|*>"
+    force = Column(Boolean, default=False)
+    status = Column(String, default="queued")       # queued|running|done|failed
+    worker = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=dt.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)   # refreshed by the worker while the job runs
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # at most one live job per key; concurrent enqueues collapse onto it
+        Index("uq_jobs_active", "dedupe_key", unique=True,
+              sqlite_where=status.in_(["queued", "running"]), postgresql_where=status.in_(["queued", "running"])),
+        Index("ix_jobs_status", "status", "id"),
+    )
+
+class HealthAggregate(Base):
+    __tablename__ = "health_aggregates"
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    quest_id = Column(Integer, ForeignKey("quests.id"), nullable=True)   # NULL = whole project
+    n = Column(Integer, default=0)                   # rows in the window (capped at health.HEALTH_WINDOW)
+    sentiment_sum = Column(Float, default=0.0)
+    updated_at = Column(DateTime, default=dt.datetime.utcnow)
+
+    __table_args__ = (Index("ix_health_scope", "project_id", "quest_id", unique=True),)
+
+class Rollup(Base):
+    __tablename__ = "rollups"
+    id = Column(Integer, primary_key=True)
+    grain = Column(String, nullable=False)                      # "hour" | "day"
+    bucket = Column(DateTime, nullable=False)                   # bucket start, UTC
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    quest_id = Column(Integer, nullable=False, default=0)       # 0 = all quests
+    cluster_id = Column(Integer, nullable=False, default=-1)    # -1 = all clusters
+    n = Column(Integer, nullable=False, default=0)
+    sentiment_sum = Column(Float, nullable=False, default=0.0)
+    sentiment_sq = Column(Float, nullable=False, default=0.0)
+    quality_sum = Column(Float, nullable=False, default=0.0)
+    quality_sq = Column(Float, nullable=False, default=0.0)
+    h0 = Column(Integer, nullable=False, default=0)             # quality histogram: 5 equal bins over 0..1
+    h1 = Column(Integer, nullable=False, default=0)
+    h2 = Column(Integer, nullable=False, default=0)
+    h3 = Column(Integer, nullable=False, default=0)
+    h4 = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (Index("uq_rollups_key", "project_id", "quest_id", "cluster_id", "grain", "bucket", unique=True),)
+
+class PointsPeriod(Base):
+    __tablename__ = "points_periods"
+    id = Column(Integer, primary_key=True)
+    critic_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    period = Column(String, nullable=False)          # week|month
+    period_start = Column(Date, nullable=False)
+    points = Column(Integer, default=0)
+
+    __table_args__ = (
+        Index("uq_points_period_critic", "period", "period_start", "critic_id", unique=True),
+        Index("ix_points_period_rank", "period", "period_start", "points"),
+    )
+
+class PointsLedger(Base):
+    __tablename__ = "points_ledger"
+    id = Column(Integer, primary_key=True)
+    critic_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    quest_id = Column(Integer, ForeignKey("quests.id"), nullable=True)
+    feedback_id = Column(Integer, ForeignKey("feedback.id"), nullable=True)
+    reward_type = Column(String, nullable=False, default="points")   # only "points" feeds User.points today
+    amount = Column(Float, nullable=False, default=0.0)
+    created_at = Column(DateTime, default=dt.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_ledger_critic_created", "critic_id", "reward_type", "created_at"),
+        Index("ix_ledger_quest", "quest_id", "reward_type"),
+        Index("ix_ledger_created", "reward_type", "created_at"),
+    )
+
+class Counter(Base):
+    __tablename__ = "counters"
+    key = Column(String, primary_key=True)           # e.g. "points"; bumped on writes to invalidate caches
+    value = Column(Integer, nullable=False, default=0)
+
+def bump(db, *keys: str) -> dict:
+    """Increment version counters in the caller's transaction; returns the new values."""
+    for key in keys:
+        if db.execute(update(Counter).where(Counter.key == key).values(value=Counter.value + 1)
+                      .execution_options(synchronize_session=False)).rowcount == 0:
+            db.execute(insert(Counter).values(key=key, value=1))
+    return versions(db, *keys)
+
+def versions(db, *keys: str) -> dict:
+    found = dict(db.execute(select(Counter.key, Counter.value).where(Counter.key.in_(keys))).all())
+    return {k: found.get(k, 0) for k in keys}
+
+# Full-text index over feedback.text (search.py). SQLite: an external-content FTS5 table kept in step by
+# triggers, so it stores only the inverted index; Postgres: a GIN expression index for to_tsvector.
+FTS_SQLITE = [
+    "CREATE VIRTUAL TABLE feedback_fts USING fts5(text, content='feedback', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS feedback_fts_ai AFTER INSERT ON feedback BEGIN "
+    "INSERT INTO feedback_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS feedback_fts_ad AFTER DELETE ON feedback BEGIN "
+    "INSERT INTO feedback_fts(feedback_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS feedback_fts_au AFTER UPDATE OF text ON feedback BEGIN "
+    "INSERT INTO feedback_fts(feedback_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+    "INSERT INTO feedback_fts(rowid, text) VALUES (new.id, new.text); END",
+    "INSERT INTO feedback_fts(feedback_fts) VALUES ('rebuild')",   # index rows that predate the table
+]
+FTS_POSTGRES = ["CREATE INDEX IF NOT EXISTS ix_feedback_fts ON feedback USING gin (to_tsvector('english', text))"]
+
+# Indexes replaced by newer ones; dropped so existing databases stop maintaining them on every write.
+DROPPED_INDEXES = ("ix_lsh_lookup",)   # superseded by ix_lsh_key
+
+def migrate(bind=None):
+    """Bring an existing database up to the current models: new tables, missing columns, missing indexes,
+    retired indexes gone."""
+    bind = bind or engine
+    Base.metadata.create_all(bind=bind)
+    insp = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            have = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in have:
+                    ddl = col.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {ddl}'))
+        for table in Base.metadata.sorted_tables:
+            for idx in table.indexes:
+                idx.create(bind=conn, checkfirst=True)
+        for name in DROPPED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        if bind.dialect.name == "sqlite" and not insp.has_table("feedback_fts"):
+            for ddl in FTS_SQLITE:
+                conn.execute(text(ddl))
+        elif bind.dialect.name == "postgresql":
+            for ddl in FTS_POSTGRES:
+                conn.execute(text(ddl))
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    migrate()
     return SessionLocal
+
+def reset_db():
+    """Empty the configured database in place, so open connections (other sessions, the job worker) stay
+    valid. Version counters survive and are all bumped: every process's cached reads go stale at once."""
+    migrate()
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("DROP TABLE IF EXISTS feedback_fts"))   # not in the metadata; triggers go with feedback
+        Base.metadata.drop_all(bind=conn, tables=[t for t in Base.metadata.sorted_tables if t is not Counter.__table__])
+        conn.execute(update(Counter).values(value=Counter.value + 1))
+    migrate()
@@ -0,0 +1,146 @@
+from __future__ import annotations
+import re, zlib, json, hashlib, argparse
+from collections import defaultdict
+from typing import Dict, List, Iterable, Tuple
+import numpy as np
+from sqlalchemy import select, update, insert
+
+from db import init_db, SessionLocal, Feedback, Quest, FeedbackSignature, LshBucket, bump
+
+# MinHash over character 5-grams, split into BANDS bands of ROWS values for LSH: a pair at Jaccard 0.7
+# shares at least one band ~99% of the time, so a lookup is a handful of indexed key probes per row
+# instead of a scan of the critic's history. Candidates are then confirmed on the full signature.
+NUM_PERM = 64
+BANDS, ROWS = 16, 4
+SHINGLE = 5
+THRESHOLD = 0.7
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)[:, None]
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)[:, None]
+
+class DuplicateFeedback(ValueError):
+    def __init__(self, original_id: int):
+        super().__init__(f"Near-duplicate of feedback #{original_id}")
+        self.original_id = original_id
+
+def shingles(text: str) -> set:
+    norm = " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+    if len(norm) <= SHINGLE:
+        return {norm}
+    return {norm[i:i + SHINGLE] for i in range(len(norm) - SHINGLE + 1)}
+
+def signatures(texts: List[str]) -> np.ndarray:
+    out = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    for i, text in enumerate(texts):
+        x = np.fromiter((zlib.crc32(s.encode()) for s in shingles(text)), dtype=np.uint64) % _PRIME
+        out[i] = ((_A * x[None, :] + _B) % _PRIME).min(axis=1)
+    return out
+
+def band_keys(sig: np.ndarray) -> List[int]:
+    return [int.from_bytes(hashlib.blake2b(bytes([b]) + sig[b * ROWS:(b + 1) * ROWS].tobytes(), digest_size=8).digest(),
+                           "little", signed=True) for b in range(BANDS)]
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+def _chunks(items: List, n: int = 900) -> Iterable[List]:
+    for i in range(0, len(items), n):
+        yield items[i:i + n]
+
+def _match(db, project_id: int, critic_ids: List[int], sigs: np.ndarray,
+           ids: List[int] | None = None) -> Tuple[List[List[int]], List[int | None]]:
+    """Band keys and the original each row duplicates (or None). With `ids`, rows also match earlier rows of the batch."""
+    keys = [band_keys(s) for s in sigs]
+    found: Dict[Tuple[int, int], set] = defaultdict(set)   # (critic_id, key) -> feedback ids
+    critics = set(critic_ids)
+    for part in _chunks(sorted({k for ks in keys for k in ks})):
+        # probe by key only: one index seek per key, where critic_id IN (...) would multiply the seeks
+        q = select(LshBucket.critic_id, LshBucket.key, LshBucket.feedback_id).where(
+            LshBucket.project_id == project_id, LshBucket.key.in_(part))
+        for c, k, fid in db.execute(q):
+            if c in critics:
+                found[(c, k)].add(fid)
+    known: Dict[int, Tuple[np.ndarray, int]] = {}          # feedback id -> (signature, original id)
+    for part in _chunks(sorted(set().union(*found.values()))):
+        q = select(FeedbackSignature.feedback_id, FeedbackSignature.signature, Feedback.duplicate_of) \
+            .join(Feedback, Feedback.id == FeedbackSignature.feedback_id).where(FeedbackSignature.feedback_id.in_(part))
+        for fid, blob, original in db.execute(q):
+            known[fid] = (np.frombuffer(blob, dtype=np.uint32), original or fid)
+    dups: List[int | None] = []
+    for i, (critic_id, sig, ks) in enumerate(zip(critic_ids, sigs, keys)):
+        best, best_sim = None, 0.0
+        for fid in sorted({f for k in ks for f in found.get((critic_id, k), ())}):
+            s = similarity(sig, known[fid][0])
+            if s >= THRESHOLD and s > best_sim:
+                best, best_sim = known[fid][1], s
+        dups.append(best)
+        if ids is not None:
+            known[ids[i]] = (sig, best or ids[i])
+            for k in ks:
+                found[(critic_id, k)].add(ids[i])
+    return keys, dups
+
+def find_duplicate(db, project_id: int, critic_id: int, text: str) -> int | None:
+    """The critic's earlier feedback in this project that `text` nearly copies, if any. Read-only."""
+    return find_duplicates(db, project_id, [critic_id], [text])[0]
+
+def find_duplicates(db, project_id: int, critic_ids: List[int], texts: List[str],
+                    within: bool = False) -> List[int | None]:
+    """find_duplicate for a batch in one round of probes. With `within`, rows also match earlier rows of the
+    batch; having no id yet, those come back as -(index + 1)."""
+    if not texts:
+        return []
+    return _match(db, project_id, critic_ids, signatures(texts), [-(i + 1) for i in range(len(texts))] if within else None)[1]
+
+def index_rows(db, project_id: int, ids: List[int], critic_ids: List[int], texts: List[str]) -> List[int | None]:
+    """Add freshly inserted rows (oldest first) to the index; returns each row's original, or None.
+    Runs in the caller's transaction; the caller stores the result in Feedback.duplicate_of."""
+    if not ids:
+        return []
+    sigs = signatures(texts)
+    keys, dups = _match(db, project_id, critic_ids, sigs, ids)
+    db.execute(insert(FeedbackSignature), [dict(feedback_id=fid, project_id=project_id, critic_id=c, signature=s.tobytes())
+                                           for fid, c, s in zip(ids, critic_ids, sigs)])
+    db.execute(insert(LshBucket), [dict(project_id=project_id, critic_id=c, key=k, feedback_id=fid)
+                                   for fid, c, ks in zip(ids, critic_ids, keys) for k in ks])
+    return dups
+
+def backfill(db, project_id: int | None = None, chunk: int = 2000) -> Dict[str, int]:
+    """Index feedback that predates the MinHash tables, oldest first, and flag the near-copies it finds.
+    Points already paid for them stay in the ledger; flagged rows drop out of clustering."""
+    q = select(Feedback.id).join(Quest).outerjoin(FeedbackSignature, FeedbackSignature.feedback_id == Feedback.id) \
+        .where(FeedbackSignature.feedback_id.is_(None)).order_by(Feedback.created_at, Feedback.id)
+    if project_id is not None:
+        q = q.where(Quest.project_id == project_id)
+    pending = db.execute(q).scalars().all()
+    indexed = flagged = 0
+    for part in _chunks(pending, chunk):
+        rows = db.execute(select(Feedback.id, Feedback.quest_id, Feedback.critic_id, Feedback.text, Quest.project_id).join(Quest)
+                          .where(Feedback.id.in_(part)).order_by(Feedback.created_at, Feedback.id)).all()
+        by_project = defaultdict(list)
+        for r in rows:
+            by_project[r.project_id].append(r)
+        for pid, items in by_project.items():
+            dups = index_rows(db, pid, [r.id for r in items], [r.critic_id for r in items], [r.text for r in items])
+            copies = [(r, d) for r, d in zip(items, dups) if d is not None]
+            if copies:
+                db.execute(update(Feedback), [{"id": r.id, "duplicate_of": d} for r, d in copies])
+                bump(db, "feedback", f"project:{pid}", *{f"quest:{r.quest_id}" for r, _ in copies},
+                     *{f"critic:{r.critic_id}" for r, _ in copies})
+            flagged += len(copies)
+        indexed += len(rows)
+        db.commit()
+    return {"indexed": indexed, "flagged": flagged}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Backfill the near-duplicate index and flag copies among existing feedback.")
+    ap.add_argument("--project", type=int, help="only this project (default: all)")
+    ap.add_argument("--chunk", type=int, default=2000)
+    args = ap.parse_args()
+    init_db()
+    db = SessionLocal()
+    try:
+        print(json.dumps(backfill(db, args.project, args.chunk)))
+    finally:
+        db.close()
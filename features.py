@@ -0,0 +1,57 @@
+from __future__ import annotations
+from typing import List, Dict, Iterable
+import numpy as np
+from sqlalchemy import select, insert
+
+from db import FeedbackFeature, Feedback, Quest
+from ai import N_FEATURES, term_counts
+
+def encode_rows(X) -> List[Dict[str, bytes]]:
+    X = X.tocsr()
+    out = []
+    for i in range(X.shape[0]):
+        lo, hi = X.indptr[i], X.indptr[i + 1]
+        out.append({"indices": X.indices[lo:hi].astype(np.int32).tobytes(),
+                    "counts": np.clip(X.data[lo:hi], 0, 65535).astype(np.uint16).tobytes()})
+    return out
+
+def store_features(db, project_id: int, feedback_ids: List[int], X):
+    if not feedback_ids:
+        return
+    rows = [dict(feedback_id=fid, project_id=project_id, **enc) for fid, enc in zip(feedback_ids, encode_rows(X))]
+    db.execute(insert(FeedbackFeature), rows)
+
+def load_matrix(db, project_id: int, feedback_ids: Iterable[int] | None = None, chunk: int = 5000,
+                originals_only: bool = False):
+    """Stack stored term vectors into one CSR matrix, ordered by feedback id. No text is read.
+    `originals_only` leaves out rows flagged as near-duplicates (Feedback.duplicate_of)."""
+    from scipy.sparse import csr_matrix
+    q = select(FeedbackFeature.feedback_id, FeedbackFeature.indices, FeedbackFeature.counts) \
+        .where(FeedbackFeature.project_id == project_id).order_by(FeedbackFeature.feedback_id)
+    if feedback_ids is not None:
+        q = q.where(FeedbackFeature.feedback_id.in_(list(feedback_ids)))
+    if originals_only:
+        q = q.join(Feedback, Feedback.id == FeedbackFeature.feedback_id).where(Feedback.duplicate_of.is_(None))
+    ids, idx_parts, data_parts, indptr = [], [], [], [0]
+    for r in db.execute(q.execution_options(yield_per=chunk)):
+        idx = np.frombuffer(r.indices, dtype=np.int32)
+        ids.append(r.feedback_id)
+        idx_parts.append(idx)
+        data_parts.append(np.frombuffer(r.counts, dtype=np.uint16))
+        indptr.append(indptr[-1] + len(idx))
+    if not ids:
+        return [], csr_matrix((0, N_FEATURES), dtype=np.float64)
+    X = csr_matrix((np.concatenate(data_parts).astype(np.float64), np.concatenate(idx_parts), np.array(indptr)),
+                   shape=(len(ids), N_FEATURES))
+    return ids, X
+
+def backfill_features(db, project_id: int, vocab: Dict[int, str] | None = None, chunk: int = 2000) -> int:
+    """Vectorize project feedback that predates the store; returns the number of rows added."""
+    missing = select(Feedback.id, Feedback.text).join(Quest) \
+        .outerjoin(FeedbackFeature, FeedbackFeature.feedback_id == Feedback.id) \
+        .where(Quest.project_id == project_id, FeedbackFeature.feedback_id.is_(None)).order_by(Feedback.id)
+    rows = db.execute(missing).all()
+    for start in range(0, len(rows), chunk):
+        part = rows[start:start + chunk]
+        store_features(db, project_id, [r.id for r in part], term_counts([r.text for r in part], vocab))
+    return len(rows)
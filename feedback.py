@@ -0,0 +1,75 @@
+from __future__ import annotations
+import datetime as dt
+from collections import defaultdict
+from typing import List, Dict, Any
+from sqlalchemy import insert, update
+from sqlalchemy.orm import joinedload
+
+from db import Quest, Feedback, bump
+from ai import sentiment_scores
+from rules import compiled, rules_for_project
+from utils import reward_points
+from clustering import index_feedback
+from dedup import DuplicateFeedback, find_duplicate, index_rows
+from health import apply_feedback as apply_health
+from rollups import apply_feedback as apply_rollups
+from ledger import award
+
+def score_text(text: str, rules: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    return score_texts([text], rules)[0]
+
+def score_texts(texts: List[str], rules: Dict[str, Any] | None = None, processes: int | None = 1) -> List[Dict[str, Any]]:
+    # top-level so it can be shipped to a process pool; one rule scan per text covers grade + fixes
+    out = []
+    for s, (g, fixes) in zip(sentiment_scores(texts, processes), compiled(rules).evaluate_batch(texts)):
+        out.append({"sentiment": s, "specificity": g["specificity"],
+                    "helpfulness": g["helpfulness"], "quality_score": g["quality"], "suggestions": fixes})
+    return out
+
+def insert_feedback(db, rows: List[Dict[str, Any]], quests: Dict[int, Quest],
+                    boosts: Dict[int, float] | None = None) -> List[int]:
+    """Bulk-insert scored rows (quest_id, critic_id, text + score_text fields, optional raid_id), flag
+    near-duplicates, index them for clustering and credit points through the ledger, all in one transaction.
+    Near-duplicates earn nothing; `boosts` maps raid_id -> reward_boost. Caller commits."""
+    boosts = boosts or {}
+    if not rows:
+        return []
+    now = dt.datetime.utcnow()
+    rows = [{"created_at": now, **r} for r in rows]
+    ids = list(db.execute(insert(Feedback).returning(Feedback.id, sort_by_parameter_order=True), rows).scalars())
+    apply_health(db, [(quests[r["quest_id"]].project_id, r["quest_id"], r["sentiment"]) for r in rows])
+    by_project = defaultdict(list)
+    for fid, r in zip(ids, rows):
+        by_project[quests[r["quest_id"]].project_id].append((fid, r))
+    updates: Dict[int, Dict[str, Any]] = {}
+    copies = set()
+    for project_id, items in by_project.items():
+        fids, texts = [fid for fid, _ in items], [r["text"] for _, r in items]
+        dups = index_rows(db, project_id, fids, [r["critic_id"] for _, r in items], texts)
+        for fid, d in zip(fids, dups):
+            if d is not None:
+                updates.setdefault(fid, {"id": fid})["duplicate_of"] = d
+                copies.add(fid)
+        for fid, cid in zip(fids, index_feedback(db, project_id, fids, texts, dups)):
+            updates.setdefault(fid, {"id": fid})["cluster_id"] = cid
+    if updates:
+        db.execute(update(Feedback), list(updates.values()))
+    apply_rollups(db, [(quests[r["quest_id"]].project_id, r["quest_id"], updates.get(fid, {}).get("cluster_id"),
+                        r["created_at"], r["sentiment"], r["quality_score"]) for fid, r in zip(ids, rows)])
+    bump(db, "feedback", *{f"quest:{r['quest_id']}" for r in rows}, *{f"critic:{r['critic_id']}" for r in rows},
+         *{f"project:{pid}" for pid in by_project})
+    award(db, [{"critic_id": r["critic_id"], "quest_id": r["quest_id"], "feedback_id": fid,
+                "amount": reward_points(r["quality_score"], quests[r["quest_id"]].reward_value,
+                                        boosts.get(r.get("raid_id"), 1.0))}
+               for fid, r in zip(ids, rows) if fid not in copies])
+    return ids
+
+def submit_feedback(db, quest_id: int, critic_id: int, text: str) -> tuple[Feedback, int]:
+    quest = db.get(Quest, quest_id, options=[joinedload(Quest.project)])
+    original = find_duplicate(db, quest.project_id, critic_id, text)
+    if original is not None:   # checked before scoring, so a pasted copy costs nothing and pays nothing
+        raise DuplicateFeedback(original)
+    row = {"quest_id": quest.id, "critic_id": critic_id, "text": text, **score_text(text, rules_for_project(quest.project))}
+    fid, = insert_feedback(db, [row], {quest.id: quest})
+    db.commit()
+    return db.get(Feedback, fid), reward_points(row["quality_score"], quest.reward_value)
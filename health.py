@@ -0,0 +1,92 @@
+from __future__ import annotations
+import datetime as dt
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from sqlalchemy import select, update, insert, func
+
+from db import HealthAggregate, Feedback, Quest, Project, bump
+from cache import cached
+
+HEALTH_WINDOW = 200   # most recent rows per project/quest that feed the Impact Meter
+
+def health_value(n: int, sentiment_sum: float) -> float | None:
+    if not n:
+        return None
+    density = min(1.0, n / HEALTH_WINDOW)
+    return round(50 + 50 * (sentiment_sum / n) * density, 1)
+
+def _window(db, project_id: int, quest_id: int | None) -> Tuple[int, float]:
+    q = select(Feedback.sentiment)
+    q = q.where(Feedback.quest_id == quest_id) if quest_id is not None else \
+        q.join(Quest).where(Quest.project_id == project_id)
+    recent = q.order_by(Feedback.created_at.desc(), Feedback.id.desc()).limit(HEALTH_WINDOW).subquery()
+    n, total = db.execute(select(func.count(), func.coalesce(func.sum(recent.c.sentiment), 0.0))).one()
+    return n, float(total)
+
+def _scope(project_id: int, quest_id: int | None):
+    return (HealthAggregate.project_id == project_id,
+            HealthAggregate.quest_id.is_(None) if quest_id is None else HealthAggregate.quest_id == quest_id)
+
+def apply_feedback(db, rows: List[Tuple[int, int, float]]):
+    """Fold new (project_id, quest_id, sentiment) rows into the aggregates; same transaction as the insert.
+    Below the window size this is a pure increment; once full, the window is re-read (bounded at HEALTH_WINDOW rows)."""
+    deltas: Dict[Tuple[int, int | None], List[float]] = defaultdict(lambda: [0, 0.0])
+    for project_id, quest_id, sentiment in rows:
+        for key in ((project_id, quest_id), (project_id, None)):
+            deltas[key][0] += 1
+            deltas[key][1] += sentiment or 0.0
+    now = dt.datetime.utcnow()
+    for (project_id, quest_id), (dn, ds) in deltas.items():
+        scope = _scope(project_id, quest_id)
+        current = db.execute(select(HealthAggregate.n).where(*scope)).scalar()
+        if current is None:
+            n, total = _window(db, project_id, quest_id)
+            db.execute(insert(HealthAggregate).values(project_id=project_id, quest_id=quest_id,
+                                                      n=n, sentiment_sum=total, updated_at=now))
+        elif current + dn <= HEALTH_WINDOW:
+            db.execute(update(HealthAggregate).where(*scope).values(
+                n=HealthAggregate.n + dn, sentiment_sum=HealthAggregate.sentiment_sum + ds, updated_at=now))
+        else:
+            n, total = _window(db, project_id, quest_id)
+            db.execute(update(HealthAggregate).where(*scope).values(n=n, sentiment_sum=total, updated_at=now))
+
+@cached("health", lambda project_ids=None: ("feedback",))
+def project_health(db, project_ids: List[int] | None = None) -> Dict[int, float | None]:
+    """All projects' health in one query."""
+    q = select(HealthAggregate.project_id, HealthAggregate.n, HealthAggregate.sentiment_sum) \
+        .where(HealthAggregate.quest_id.is_(None))
+    if project_ids is not None:
+        q = q.where(HealthAggregate.project_id.in_(list(project_ids)))
+    return {pid: health_value(n, s) for pid, n, s in db.execute(q)}
+
+def quest_health(db, project_id: int) -> Dict[int, float | None]:
+    q = select(HealthAggregate.quest_id, HealthAggregate.n, HealthAggregate.sentiment_sum) \
+        .where(HealthAggregate.project_id == project_id, HealthAggregate.quest_id.is_not(None))
+    return {qid: health_value(n, s) for qid, n, s in db.execute(q)}
+
+def rebuild(db, project_id: int | None = None):
+    """Recompute aggregates from raw feedback: every project (databases created before the table existed)
+    or just one project's project- and quest-level rows."""
+    delete = HealthAggregate.__table__.delete()
+    projects, quests = select(Project.id), select(Quest.id, Quest.project_id)
+    if project_id is not None:
+        delete = delete.where(HealthAggregate.project_id == project_id)
+        projects, quests = projects.where(Project.id == project_id), quests.where(Quest.project_id == project_id)
+    db.execute(delete)
+    now = dt.datetime.utcnow()
+    rows = []
+    for pid, in db.execute(projects).all():
+        rows.append(dict(project_id=pid, quest_id=None, updated_at=now,
+                         **dict(zip(("n", "sentiment_sum"), _window(db, pid, None)))))
+    for qid, pid in db.execute(quests).all():
+        rows.append(dict(project_id=pid, quest_id=qid, updated_at=now,
+                         **dict(zip(("n", "sentiment_sum"), _window(db, pid, qid)))))
+    if rows:
+        db.execute(insert(HealthAggregate), rows)
+    bump(db, "feedback")
+    db.commit()
+
+def ensure_aggregates(db):
+    if db.execute(select(HealthAggregate.id).limit(1)).first() is None and \
+            db.execute(select(Feedback.id).limit(1)).first() is not None:
+        rebuild(db)
@@ -0,0 +1,123 @@
+from __future__ import annotations
+import os, csv, json, time, argparse, datetime as dt
+from collections import deque, defaultdict
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Iterator, List, Dict, Any
+from sqlalchemy import select
+
+from db import init_db, SessionLocal, User, Project, Quest
+from feedback import score_texts, insert_feedback
+from rules import rules_for_project
+
+CHUNK_SIZE = 5000
+
+def read_records(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """Stream a .csv or .jsonl file in chunks of dicts; only `text` is required per record."""
+    with open(path, newline="", encoding="utf-8") as fh:
+        if path.endswith((".jsonl", ".ndjson")):
+            records = (json.loads(line) for line in fh if line.strip())
+        else:
+            records = csv.DictReader(fh)
+        chunk = []
+        for rec in records:
+            chunk.append(rec)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def _as_id(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _resolve(db, chunk, quests, default_quest, default_critic) -> List[Dict[str, Any]]:
+    """Records -> insertable rows, or None for records to skip (no text, unknown quest or critic)."""
+    emails = {r["critic_email"] for r in chunk if r.get("critic_email")}
+    by_email = dict(db.execute(select(User.email, User.id).where(User.email.in_(emails), User.role == "critic"))
+                    .all()) if emails else {}
+    ids = {_as_id(r["critic_id"]) for r in chunk if r.get("critic_id")} - {None}
+    critics = set(db.execute(select(User.id).where(User.id.in_(ids), User.role == "critic")).scalars()) if ids else set()
+    rows = []
+    for r in chunk:
+        text = (r.get("text") or "").strip()
+        quest_id = _as_id(r.get("quest_id") or default_quest)
+        if r.get("critic_id"):
+            critic_id = _as_id(r["critic_id"])
+            critic_id = critic_id if critic_id in critics else None
+        elif r.get("critic_email"):
+            critic_id = by_email.get(r["critic_email"])
+        else:
+            critic_id = default_critic
+        if not text or quest_id not in quests or critic_id is None:
+            rows.append(None)
+            continue
+        row = {"quest_id": quest_id, "critic_id": critic_id, "text": text}
+        if r.get("created_at"):
+            try:
+                row["created_at"] = dt.datetime.fromisoformat(str(r["created_at"]))
+            except ValueError:
+                row = None
+        rows.append(row)
+    return rows
+
+def ingest_file(path: str, quest_id: int | None = None, critic_email: str | None = None,
+                chunk_size: int = CHUNK_SIZE, workers: int | None = None, log=print) -> Dict[str, float]:
+    """Score records in a process pool and bulk-insert them one transaction per chunk."""
+    init_db()
+    db = SessionLocal()
+    quests = {q.id: q for q in db.query(Quest).all()}
+    rulesets = {p.id: rules_for_project(p) for p in db.query(Project).all()}
+    default_critic = None
+    if critic_email:
+        default_critic = db.execute(select(User.id).filter_by(email=critic_email, role="critic")).scalar()
+        if default_critic is None:
+            raise ValueError(f"Unknown critic: {critic_email}")
+    workers = workers or os.cpu_count() or 1
+    inserted = skipped = 0
+    start = time.perf_counter()
+    pending: deque[tuple[List[Dict[str, Any]], Future]] = deque()
+
+    def drain_one():
+        nonlocal inserted
+        rows, fut = pending.popleft()
+        scored = fut.result()
+        batch = [{**r, **s} for r, s in zip(rows, scored)]
+        insert_feedback(db, batch, quests)
+        db.commit()
+        inserted += len(batch)
+        log(f"{inserted} rows · {inserted / (time.perf_counter() - start):.0f} rows/sec")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in read_records(path, chunk_size):
+                resolved = _resolve(db, chunk, quests, quest_id, default_critic)
+                rows = [r for r in resolved if r is not None]
+                skipped += len(resolved) - len(rows)
+                by_project = defaultdict(list)
+                for r in rows:
+                    by_project[quests[r["quest_id"]].project_id].append(r)
+                for pid, part in by_project.items():
+                    pending.append((part, pool.submit(score_texts, [r["text"] for r in part], rulesets[pid])))
+                while len(pending) > workers:  # bound memory: only a few chunks in flight
+                    drain_one()
+            while pending:
+                drain_one()
+    finally:
+        db.close()
+    seconds = time.perf_counter() - start
+    return {"rows": inserted, "skipped": skipped, "seconds": round(seconds, 3),
+            "rows_per_sec": round(inserted / seconds, 1) if seconds else 0.0}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Bulk-import feedback from CSV or JSONL.")
+    ap.add_argument("path")
+    ap.add_argument("--quest", type=int, help="quest id for records without quest_id")
+    ap.add_argument("--critic", help="critic email for records without critic_id/critic_email")
+    ap.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+    stats = ingest_file(args.path, args.quest, args.critic, args.chunk_size, args.workers)
+    print(json.dumps(stats))
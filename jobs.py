@@ -0,0 +1,160 @@
+from __future__ import annotations
+import os, sys, time, atexit, argparse, threading, subprocess, datetime as dt
+import multiprocessing as mp
+from typing import List
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.exc import IntegrityError
+
+from db import init_db, SessionLocal, Job, ClusterSummary, Feedback, bump
+from cache import cached
+from ai import do_next_cards
+from clustering import recluster
+
+ACTIVE = ("queued", "running")
+HEARTBEAT_SECONDS = 30.0
+STALE_AFTER = dt.timedelta(minutes=2)    # running jobs without a heartbeat this long are assumed orphaned
+POLL_SECONDS = 1.0
+
+def job_key(project_id: int, quest_id: int | None = None) -> str:
+    return f"cluster:{project_id}:{quest_id if quest_id is not None else '*'}"
+
+def enqueue(db, project_id: int, quest_id: int | None = None, force: bool = False) -> Job:
+    key = job_key(project_id, quest_id)
+    job = db.query(Job).filter(Job.dedupe_key == key, Job.status.in_(ACTIVE)).first()
+    if job:
+        if force and not job.force:   # a running job picks this up when it finishes and goes again
+            db.execute(update(Job).where(Job.id == job.id).values(force=True))
+            db.commit()
+        return job
+    job = Job(project_id=project_id, quest_id=quest_id, dedupe_key=key, force=force)
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:  # lost the race to another session; share its job
+        db.rollback()
+        job = db.query(Job).filter(Job.dedupe_key == key, Job.status.in_(ACTIVE)).first()
+    return job
+
+def latest_job(db, project_id: int, quest_id: int | None = None) -> Job | None:
+    return db.query(Job).filter_by(dedupe_key=job_key(project_id, quest_id)).order_by(Job.id.desc()).first()
+
+@cached("cluster_cards", lambda project_id, quest_id=None: (f"summaries:{project_id}",))
+def summaries(db, project_id: int, quest_id: int | None = None) -> List:
+    q = select(ClusterSummary.cluster_id, ClusterSummary.title, ClusterSummary.summary, ClusterSummary.do_next,
+               ClusterSummary.updated_at).filter_by(project_id=project_id, quest_id=quest_id) \
+        .order_by(ClusterSummary.cluster_id)
+    return db.execute(q).all()
+
+def _claim(db, worker: str) -> Job | None:
+    now = dt.datetime.utcnow()
+    db.execute(update(Job).where(Job.status == "running",
+                                 func.coalesce(Job.heartbeat_at, Job.started_at) < now - STALE_AFTER)
+               .values(status="queued", worker=None))
+    db.commit()
+    while True:
+        jid = db.execute(select(Job.id).where(Job.status == "queued").order_by(Job.id).limit(1)).scalar()
+        if jid is None:
+            return None
+        res = db.execute(update(Job).where(Job.id == jid, Job.status == "queued")
+                         .values(status="running", started_at=now, heartbeat_at=now, worker=worker))
+        db.commit()
+        if res.rowcount == 1:
+            return db.get(Job, jid)
+
+def _heartbeat(job_id: int, worker: str, stop: threading.Event, every: float = HEARTBEAT_SECONDS):
+    """Keeps a long refit from looking orphaned to other workers' _claim."""
+    while not stop.wait(every):
+        db = SessionLocal()
+        try:
+            db.execute(update(Job).where(Job.id == job_id, Job.worker == worker, Job.status == "running")
+                       .values(heartbeat_at=dt.datetime.utcnow()))
+            db.commit()
+        except Exception:   # a missed beat is harmless; the next one will do
+            db.rollback()
+        finally:
+            db.close()
+
+def run_job(db, job: Job):
+    forced = bool(job.force)
+    res = recluster(db, job.project_id, force=forced)
+    top_terms = res["top_terms"]
+    if job.quest_id is not None:
+        fids = db.execute(select(Feedback.id).filter_by(quest_id=job.quest_id)).scalars()
+        live = {res["labels"][fid] for fid in fids if fid in res["labels"]}   # rows newer than recluster's snapshot
+    else:
+        live = set(res["labels"].values())
+    cards = do_next_cards({cid: t for cid, t in top_terms.items() if cid in live})
+    now = dt.datetime.utcnow()
+    db.execute(delete(ClusterSummary).where(ClusterSummary.project_id == job.project_id,
+                                            ClusterSummary.quest_id == job.quest_id))
+    db.add_all([ClusterSummary(project_id=job.project_id, quest_id=job.quest_id, cluster_id=c["cluster_id"],
+                               title=c["title"], summary=", ".join(top_terms[c["cluster_id"]]),
+                               do_next=[{"action": c["action"], "impact": c["impact"], "effort": c["effort"]}],
+                               updated_at=now) for c in cards])
+    db.refresh(job)
+    if job.force and not forced:   # a full refit was asked for while this one ran
+        job.status, job.worker = "queued", None
+    else:
+        job.status, job.finished_at = "done", now
+    bump(db, f"summaries:{job.project_id}")
+    db.commit()
+
+def work(once: bool = False, poll: float = POLL_SECONDS, parent: int | None = None):
+    """`parent`: exit once that process is gone (the Streamlit server that spawned us)."""
+    worker = f"pid:{os.getpid()}"
+    init_db()
+    while True:
+        if parent is not None and os.getppid() != parent:
+            return
+        db = SessionLocal()
+        try:
+            job = _claim(db, worker)
+            if job is None:
+                if once:
+                    return
+                time.sleep(poll)
+                continue
+            stop = threading.Event()
+            beat = threading.Thread(target=_heartbeat, args=(job.id, worker, stop), daemon=True)
+            beat.start()
+            try:
+                run_job(db, job)
+            except Exception as e:
+                db.rollback()
+                db.execute(update(Job).where(Job.id == job.id)
+                           .values(status="failed", error=repr(e), finished_at=dt.datetime.utcnow()))
+                db.commit()
+            finally:
+                stop.set()
+                beat.join()
+        finally:
+            db.close()
+
+def spawn_worker() -> subprocess.Popen:
+    """Local worker for the Streamlit server; ML stays out of the UI process. It is stopped when the server
+    exits, and stops itself if the server is killed without cleanup."""
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--parent", str(os.getpid())],
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    atexit.register(stop_worker, proc)
+    return proc
+
+def stop_worker(proc: subprocess.Popen, timeout: float = 5.0):
+    if proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Run the clustering/summary job worker.")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--once", action="store_true", help="drain the queue and exit")
+    ap.add_argument("--parent", type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.workers <= 1:
+        work(once=args.once, parent=args.parent)
+    else:
+        procs = [mp.Process(target=work, kwargs={"once": args.once}) for _ in range(args.workers)]
+        for p in procs: p.start()
+        for p in procs: p.join()
@@ -0,0 +1,115 @@
+from __future__ import annotations
+import bisect, threading, datetime as dt
+from typing import Dict, List, Tuple
+from sqlalchemy import select, update, insert, and_, or_, event
+from sqlalchemy.orm import Session
+
+from db import User, PointsPeriod, bump, versions
+
+TOP_N = 100
+PAGE_SIZE = 25
+PERIODS = ("week", "month")
+VERSION_KEY = "points"
+
+def period_start(period: str, when: dt.datetime | dt.date | None = None) -> dt.date:
+    d = (when or dt.datetime.utcnow())
+    d = d.date() if isinstance(d, dt.datetime) else d
+    return d - dt.timedelta(days=d.weekday()) if period == "week" else d.replace(day=1)
+
+class _RankIndex:
+    """Critic points kept sorted (descending) per process; rank lookup is a bisect.
+    Rebuilt only when another process moved the version counter."""
+
+    def __init__(self):
+        self.version = -1
+        self.keys: List[int] = []          # -points, ascending
+        self.lock = threading.Lock()
+
+    def sync(self, db, version: int):
+        if version != self.version:
+            pts = db.execute(select(User.points).where(User.role == "critic")).scalars()
+            self.keys = sorted(-(p or 0) for p in pts)
+            self.version = version
+
+    def rank(self, points: int) -> int:
+        return bisect.bisect_left(self.keys, -points) + 1
+
+    def move(self, old: int, new: int):
+        i = bisect.bisect_left(self.keys, -old)
+        if i < len(self.keys) and self.keys[i] == -old:
+            del self.keys[i]
+        bisect.insort(self.keys, -new)
+
+_RANKS = _RankIndex()
+_TOP: Tuple[int, int, List] = (-1, 0, [])   # (version, n, rows)
+
+def record_points(db, earned: Dict[int, int], totals: Dict[int, int], when: dt.datetime | None = None):
+    """Called in the awarding transaction: period totals, cache version, in-process rank index."""
+    if not earned:
+        return
+    for period in PERIODS:
+        start = period_start(period, when)
+        for critic_id, pts in earned.items():
+            scope = and_(PointsPeriod.period == period, PointsPeriod.period_start == start,
+                         PointsPeriod.critic_id == critic_id)
+            if db.execute(update(PointsPeriod).where(scope).values(points=PointsPeriod.points + pts)
+                          .execution_options(synchronize_session=False)).rowcount == 0:
+                db.execute(insert(PointsPeriod).values(period=period, period_start=start, critic_id=critic_id, points=pts))
+    version = bump(db, VERSION_KEY)[VERSION_KEY]
+    # the in-process index is only patched once this transaction commits (see _apply_rank_moves)
+    db.info.setdefault("rank_moves", []).append(
+        (version, [(totals[critic_id] - pts, totals[critic_id]) for critic_id, pts in earned.items()]))
+
+@event.listens_for(Session, "after_commit")
+def _apply_rank_moves(session):
+    for version, moves in session.info.pop("rank_moves", []):
+        with _RANKS.lock:
+            if _RANKS.version == version - 1:   # index was current just before this write: patch it in place
+                for old, new in moves:
+                    _RANKS.move(old, new)
+                _RANKS.version = version
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rank_moves(session):
+    session.info.pop("rank_moves", None)
+
+def invalidate():
+    global _TOP
+    with _RANKS.lock:
+        _RANKS.version = -1
+    _TOP = (-1, 0, [])
+
+def _version(db) -> int:
+    return versions(db, VERSION_KEY)[VERSION_KEY]
+
+def page(db, after: Tuple[int, int] | None = None, limit: int = PAGE_SIZE) -> List:
+    """All-time leaderboard page; `after` is the (points, id) of the previous page's last row."""
+    q = select(User.id, User.name, User.email, User.points, User.streak, User.badges) \
+        .where(User.role == "critic").order_by(User.points.desc(), User.id).limit(limit)
+    if after is not None:
+        pts, uid = after
+        q = q.where(or_(User.points < pts, and_(User.points == pts, User.id > uid)))
+    return db.execute(q).all()
+
+def top_n(db, n: int = TOP_N) -> List:
+    """Cached top-N, invalidated when any critic's points change."""
+    global _TOP
+    version = _version(db)
+    if _TOP[0] != version or _TOP[1] < n:
+        _TOP = (version, n, page(db, limit=n))
+    return _TOP[2][:n]
+
+def rank_of(db, critic_id: int) -> Tuple[int, int]:
+    """(rank, total critics) for one critic without scanning the user table on every call."""
+    points = db.execute(select(User.points).where(User.id == critic_id)).scalar() or 0
+    with _RANKS.lock:
+        _RANKS.sync(db, _version(db))
+        return _RANKS.rank(points), len(_RANKS.keys)
+
+def period_page(db, period: str, when: dt.datetime | None = None, limit: int = PAGE_SIZE) -> List:
+    start = period_start(period, when)
+    q = select(User.id, User.name, User.email, PointsPeriod.points) \
+        .join(User, User.id == PointsPeriod.critic_id) \
+        .where(PointsPeriod.period == period, PointsPeriod.period_start == start) \
+        .order_by(PointsPeriod.points.desc(), User.id).limit(limit)
+    return db.execute(q).all()
@@ -0,0 +1,67 @@
+from __future__ import annotations
+import datetime as dt
+from collections import defaultdict
+from typing import Dict, List, Any
+from sqlalchemy import select, update, insert, func
+
+from db import User, PointsLedger
+from utils import sample_badges, crosses_badge
+from leaderboard import record_points
+
+def award(db, entries: List[Dict[str, Any]]) -> Dict[int, int]:
+    """Append ledger rows (critic_id, quest_id, feedback_id, amount[, reward_type]) and apply "points"
+    to the cached User.points with one SQL-side increment per critic. Runs in the caller's transaction;
+    returns the new point totals of the credited critics."""
+    if not entries:
+        return {}
+    now = dt.datetime.utcnow()
+    db.execute(insert(PointsLedger), [{"reward_type": "points", "created_at": now, **e} for e in entries])
+    earned: Dict[int, int] = defaultdict(int)
+    for e in entries:
+        if e.get("reward_type", "points") == "points":
+            earned[e["critic_id"]] += int(e["amount"])
+    totals = {}
+    for critic_id, pts in earned.items():
+        new = db.execute(update(User).where(User.id == critic_id).values(points=User.points + pts)
+                         .returning(User.points).execution_options(synchronize_session=False)).scalar()
+        if new is None:
+            raise ValueError(f"Unknown critic: {critic_id}")
+        totals[critic_id] = new
+        if crosses_badge(new - pts, new):
+            db.execute(update(User).where(User.id == critic_id).values(badges=sample_badges(new))
+                       .execution_options(synchronize_session=False))
+    record_points(db, earned, totals, when=now)
+    return totals
+
+def _total(db, *where) -> float:
+    return float(db.execute(select(func.coalesce(func.sum(PointsLedger.amount), 0.0)).where(*where)).scalar())
+
+def critic_total(db, critic_id: int, since: dt.datetime | None = None, reward_type: str = "points") -> float:
+    where = [PointsLedger.critic_id == critic_id, PointsLedger.reward_type == reward_type]
+    if since is not None:
+        where.append(PointsLedger.created_at >= since)
+    return _total(db, *where)
+
+def quest_total(db, quest_id: int, reward_type: str = "points") -> float:
+    return _total(db, PointsLedger.quest_id == quest_id, PointsLedger.reward_type == reward_type)
+
+def period_totals(db, since: dt.datetime, until: dt.datetime | None = None, reward_type: str = "points",
+                  limit: int | None = None) -> List:
+    """(critic_id, total) over a time range, highest first."""
+    total = func.sum(PointsLedger.amount).label("total")
+    q = select(PointsLedger.critic_id, total) \
+        .where(PointsLedger.reward_type == reward_type, PointsLedger.created_at >= since) \
+        .group_by(PointsLedger.critic_id).order_by(total.desc())
+    if until is not None:
+        q = q.where(PointsLedger.created_at < until)
+    if limit:
+        q = q.limit(limit)
+    return db.execute(q).all()
+
+def ensure_opening_balances(db):
+    """Databases from before the ledger: book each critic's existing points as one opening entry."""
+    has_ledger = select(PointsLedger.id).where(PointsLedger.critic_id == User.id).exists()
+    rows = db.execute(select(User.id, User.points).where(User.points > 0, ~has_ledger)).all()
+    if rows:
+        db.execute(insert(PointsLedger), [{"critic_id": uid, "amount": pts, "reward_type": "points"} for uid, pts in rows])
+        db.commit()
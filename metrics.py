@@ -0,0 +1,130 @@
+from __future__ import annotations
+import os, json, time, heapq, threading, functools
+from collections import deque, defaultdict
+from typing import Callable, Dict, List, Any
+
+# In-memory, bounded: each operation keeps its last RING_SIZE timings; the SLOWEST_N slowest SQL
+# statements are kept with their text. Nothing here touches the database.
+RING_SIZE = 2048
+SLOWEST_N = 20
+METRICS_FILE = os.environ.get("ITERRATE_METRICS_FILE", "metrics.prom")   # server config only, never user input
+
+_LOCK = threading.Lock()
+_RINGS: Dict[str, deque] = defaultdict(lambda: deque(maxlen=RING_SIZE))
+_SLOWEST: List[tuple] = []          # min-heap of (seconds, seq, statement)
+_SEQ = 0
+_LOCAL = threading.local()
+
+def record(op: str, seconds: float):
+    with _LOCK:
+        _RINGS[op].append(seconds)
+
+def timed(op: str):
+    def deco(fn: Callable):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(op, time.perf_counter() - start)
+        return wrapper
+    return deco
+
+class span:
+    """`with metrics.span("render:plotly"): ...`"""
+    def __init__(self, op: str):
+        self.op = op
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    def __exit__(self, *exc):
+        record(self.op, time.perf_counter() - self.start)
+
+# ---- SQL ----
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_metrics_start", []).append(time.perf_counter())
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    global _SEQ
+    seconds = time.perf_counter() - conn.info["_metrics_start"].pop()
+    with _LOCK:
+        _RINGS["sql"].append(seconds)
+        _SEQ += 1
+        item = (seconds, _SEQ, " ".join(statement.split())[:300])
+        if len(_SLOWEST) < SLOWEST_N:
+            heapq.heappush(_SLOWEST, item)
+        elif seconds > _SLOWEST[0][0]:
+            heapq.heapreplace(_SLOWEST, item)
+    if getattr(_LOCAL, "queries", None) is not None:
+        _LOCAL.queries += 1
+        _LOCAL.sql_seconds += seconds
+
+def instrument_engine(engine):
+    from sqlalchemy import event
+    if not event.contains(engine, "before_cursor_execute", _before):
+        event.listen(engine, "before_cursor_execute", _before)
+        event.listen(engine, "after_cursor_execute", _after)
+
+# ---- per rerun ----
+
+def begin_rerun():
+    _LOCAL.queries = 0
+    _LOCAL.sql_seconds = 0.0
+    _LOCAL.start = time.perf_counter()
+
+def end_rerun(page: str):
+    if getattr(_LOCAL, "start", None) is None:
+        return
+    record(f"page:{page}", time.perf_counter() - _LOCAL.start)
+    record(f"page:{page}:sql", _LOCAL.sql_seconds)
+    with _LOCK:
+        _RINGS[f"page:{page}:queries"].append(float(_LOCAL.queries))
+    _LOCAL.start = _LOCAL.queries = None
+
+# ---- reporting ----
+
+def _pct(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(round(p * (len(sorted_vals) - 1))))]
+
+def summary() -> List[Dict[str, Any]]:
+    with _LOCK:
+        rings = {op: sorted(vals) for op, vals in _RINGS.items()}
+    rows = []
+    for op, vals in sorted(rings.items()):
+        scale = 1.0 if op.endswith(":queries") else 1000.0   # counts stay counts, times in ms
+        rows.append({"operation": op, "n": len(vals), "p50": round(_pct(vals, 0.5) * scale, 3),
+                     "p95": round(_pct(vals, 0.95) * scale, 3), "max": round(vals[-1] * scale, 3)})
+    return rows
+
+def slowest_queries() -> List[Dict[str, Any]]:
+    with _LOCK:
+        items = sorted(_SLOWEST, reverse=True)
+    return [{"ms": round(s * 1000, 3), "statement": stmt} for s, _, stmt in items]
+
+def export(path: str | None = None) -> str:
+    """Write a snapshot to METRICS_FILE; `.prom` gets Prometheus text format, anything else a JSONL line per operation."""
+    path = path or METRICS_FILE
+    rows = summary()
+    with open(path, "a" if not path.endswith(".prom") else "w", encoding="utf-8") as fh:
+        if path.endswith(".prom"):
+            fh.write("# TYPE iterrate_operation summary\n")
+            for r in rows:
+                op = r["operation"].replace('"', "'")
+                for q, key in (("0.5", "p50"), ("0.95", "p95")):
+                    fh.write(f'iterrate_operation{{op="{op}",quantile="{q}"}} {r[key]}\n')
+                fh.write(f'iterrate_operation_count{{op="{op}"}} {r["n"]}\n')
+        else:
+            ts = time.time()
+            for r in rows:
+                fh.write(json.dumps({"ts": ts, **r}) + "\n")
+    return os.path.abspath(path)
+
+def reset():
+    global _SLOWEST
+    with _LOCK:
+        _RINGS.clear()
+        _SLOWEST = []
@@ -0,0 +1,165 @@
+from __future__ import annotations
+import time, queue, threading, datetime as dt
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Dict, List
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from db import SessionLocal, Raid, Quest, Feedback, bump
+from feedback import score_texts, insert_feedback, submit_feedback
+from dedup import DuplicateFeedback, find_duplicates
+from rules import rules_for_project
+from utils import reward_points
+from cache import cached, resource
+import metrics
+
+# During a raid every Streamlit session funnels submissions into one in-process buffer; a single writer
+# thread flushes at most once per FLUSH_MS, scoring and inserting everything queued in one transaction,
+# so a burst of reviewers costs a few commits a second however many there are. An idle buffer flushes
+# the first arrival straight away. Live counters are kept in memory.
+FLUSH_MS = 250
+MAX_BATCH = 500
+RESULT_TIMEOUT = 30.0
+
+def create_raid(db, quest_id: int, title: str, starts_at: dt.datetime, minutes: int = 30,
+                min_reviewers: int = 10, reward_boost: float = 1.0) -> Raid:
+    raid = Raid(quest_id=quest_id, title=title, starts_at=starts_at, ends_at=starts_at + dt.timedelta(minutes=minutes),
+                min_reviewers=min_reviewers, reward_boost=reward_boost)
+    db.add(raid)
+    bump(db, "raids")
+    db.commit()
+    return raid
+
+@cached("open_raids", lambda: ("raids",))
+def open_raids(db) -> List:
+    """Raids not yet over when computed; callers filter on the current time, so a cached list stays correct."""
+    q = select(Raid.id, Raid.quest_id, Raid.title, Raid.starts_at, Raid.ends_at, Raid.min_reviewers,
+               Raid.reward_boost).where(Raid.ends_at > dt.datetime.utcnow()).order_by(Raid.starts_at)
+    return db.execute(q).all()
+
+def active_raid(db, quest_id: int, when: dt.datetime | None = None):
+    when = when or dt.datetime.utcnow()
+    return next((r for r in open_raids(db) if r.quest_id == quest_id and r.starts_at <= when < r.ends_at), None)
+
+# ---- live counters ----
+
+_COUNTS: Dict[int, list] = resource("raid_counts", dict)   # raid_id -> [submissions, {critic ids}]
+_COUNTS_LOCK = threading.Lock()
+
+def counts(raid_id: int) -> Dict[str, int]:
+    """Submissions and distinct reviewers; read from the database once per process, then from memory."""
+    with _COUNTS_LOCK:
+        if raid_id not in _COUNTS:
+            db = SessionLocal()
+            try:
+                critics = db.execute(select(Feedback.critic_id).where(Feedback.raid_id == raid_id)).scalars().all()
+            finally:
+                db.close()
+            _COUNTS[raid_id] = [len(critics), set(critics)]
+        n, critics = _COUNTS[raid_id]
+        return {"submissions": n, "reviewers": len(critics)}
+
+def _count(raid_id: int, critic_id: int):
+    if raid_id in _COUNTS:       # unseeded raids get everything committed so far on first read
+        _COUNTS[raid_id][0] += 1
+        _COUNTS[raid_id][1].add(critic_id)
+
+# ---- write buffer ----
+
+class _Pending:
+    __slots__ = ("quest_id", "critic_id", "text", "raid_id", "future")
+
+    def __init__(self, quest_id: int, critic_id: int, text: str, raid_id: int):
+        self.quest_id, self.critic_id, self.text, self.raid_id = quest_id, critic_id, text, raid_id
+        self.future: Future = Future()
+
+class WriteBuffer:
+    def __init__(self, flush_ms: int = FLUSH_MS, max_batch: int = MAX_BATCH):
+        self.flush_ms, self.max_batch = flush_ms, max_batch
+        self.queue: queue.Queue = queue.Queue()
+        self.flushes = self.rows = 0
+        self.last_flush = 0.0
+        self.thread = threading.Thread(target=self._run, name="iterrate-raid-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, quest_id: int, critic_id: int, text: str, raid_id: int) -> Future:
+        """Resolves to (feedback_id, points earned), or raises DuplicateFeedback."""
+        item = _Pending(quest_id, critic_id, text, raid_id)
+        self.queue.put(item)
+        return item.future
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = self.last_flush + self.flush_ms / 1000
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:   # past the deadline: still take whatever is already queued
+                    batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.last_flush = time.monotonic()
+            with metrics.span("raid.flush"):
+                self._flush(batch)
+
+    def _flush(self, batch: List[_Pending]):
+        db = SessionLocal()
+        try:
+            quests = {q.id: q for q in db.query(Quest).options(joinedload(Quest.project))
+                      .filter(Quest.id.in_({p.quest_id for p in batch}))}
+            boosts = dict(db.execute(select(Raid.id, Raid.reward_boost)
+                                     .where(Raid.id.in_({p.raid_id for p in batch}))).all())
+            by_project: Dict[int, List[_Pending]] = defaultdict(list)
+            for p in batch:
+                by_project[quests[p.quest_id].project_id].append(p)
+            rows, order, copies_of = [], [], []   # copies_of: (copy, the earlier batch item it repeats)
+            for pid, items in by_project.items():
+                originals = find_duplicates(db, pid, [p.critic_id for p in items], [p.text for p in items], within=True)
+                for p, original in zip(items, originals):
+                    if original is not None and original < 0:
+                        copies_of.append((p, items[-original - 1]))
+                    elif original is not None:
+                        p.future.set_exception(DuplicateFeedback(original))
+                items = [p for p, original in zip(items, originals) if original is None]
+                if not items:
+                    continue
+                scored = score_texts([p.text for p in items], rules_for_project(quests[items[0].quest_id].project))
+                rows += [{"quest_id": p.quest_id, "critic_id": p.critic_id, "text": p.text, "raid_id": p.raid_id, **s}
+                         for p, s in zip(items, scored)]
+                order += items
+            ids = insert_feedback(db, rows, quests, boosts)
+            copies = set(db.execute(select(Feedback.id).where(Feedback.id.in_(ids),
+                                                              Feedback.duplicate_of.is_not(None))).scalars())
+            with _COUNTS_LOCK:
+                db.commit()
+                for p in order:
+                    _count(p.raid_id, p.critic_id)
+            self.flushes += 1
+            self.rows += len(ids)
+            for p, fid, r in zip(order, ids, rows):
+                pts = 0 if fid in copies else reward_points(r["quality_score"], quests[p.quest_id].reward_value,
+                                                            boosts.get(p.raid_id, 1.0))
+                p.future.set_result((fid, pts))
+            stored = {p: fid for p, fid in zip(order, ids)}
+            for p, original in copies_of:
+                p.future.set_exception(DuplicateFeedback(stored[original]))
+        except Exception as e:
+            db.rollback()
+            for p in batch:
+                if not p.future.done():
+                    p.future.set_exception(e)
+        finally:
+            db.close()
+
+def buffer() -> WriteBuffer:
+    return resource("raid_buffer", WriteBuffer)
+
+def submit(db, quest_id: int, critic_id: int, text: str) -> int:
+    """Submit feedback and return the points earned: buffered and boosted while the quest has a live raid,
+    written directly otherwise. Raises DuplicateFeedback for near-copies."""
+    raid = active_raid(db, quest_id)
+    if raid is None:
+        return submit_feedback(db, quest_id, critic_id, text)[1]
+    db.commit()   # end our read transaction: the pooled connection is better spent on the writer while we wait
+    return buffer().submit(quest_id, critic_id, text, raid.id).result(timeout=RESULT_TIMEOUT)[1]
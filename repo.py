@@ -0,0 +1,82 @@
+from __future__ import annotations
+from typing import Dict, List, Tuple, Any
+from sqlalchemy import select, and_, or_, func
+
+from db import Project, Quest, Feedback, HealthAggregate
+from cache import cached
+
+# Each page gets a fixed number of queries regardless of how many projects/quests/rows it shows.
+# Results are plain Rows (attribute access, picklable) rather than session-bound ORM objects.
+
+PROJECT_COLS = (Project.id, Project.owner_id, Project.name, Project.slug, Project.description, Project.url, Project.tags)
+QUEST_COLS = (Quest.id, Quest.project_id, Quest.title, Quest.brief, Quest.tags, Quest.reward_type,
+              Quest.reward_value, Quest.deadline, Quest.status)
+FEEDBACK_COLS = (Feedback.id, Feedback.quest_id, Feedback.critic_id, Feedback.text, Feedback.sentiment,
+                 Feedback.specificity, Feedback.helpfulness, Feedback.quality_score, Feedback.cluster_id,
+                 Feedback.suggestions, Feedback.duplicate_of, Feedback.created_at)
+
+@cached("home_projects", lambda: ("projects", "feedback"))
+def home_projects(db) -> List:
+    """Home: every project with its health window — 1 query."""
+    q = select(*PROJECT_COLS, HealthAggregate.n, HealthAggregate.sentiment_sum) \
+        .outerjoin(HealthAggregate, and_(HealthAggregate.project_id == Project.id, HealthAggregate.quest_id.is_(None))) \
+        .order_by(Project.id)
+    return db.execute(q).all()
+
+@cached("projects", lambda owner_id=None: ("projects",))
+def projects(db, owner_id: int | None = None) -> List:
+    """Projects page / founder pickers — 1 query."""
+    q = select(*PROJECT_COLS).order_by(Project.id)
+    if owner_id is not None:
+        q = q.where(Project.owner_id == owner_id)
+    return db.execute(q).all()
+
+@cached("quests", lambda owner_id=None: ("quests",))
+def quests(db, owner_id: int | None = None) -> List:
+    """Quests page — 1 query (all quests for critics, owned quests for founders)."""
+    q = select(*QUEST_COLS).order_by(Quest.id)
+    if owner_id is not None:
+        q = q.join(Project).where(Project.owner_id == owner_id)
+    return db.execute(q).all()
+
+FEEDBACK_PAGE = 25
+# sort name -> (column, descending); every sort pages on (column, id) so cursors stay stable
+FEEDBACK_SORTS = {"newest": (Feedback.created_at, True), "oldest": (Feedback.created_at, False),
+                  "best quality": (Feedback.quality_score, True), "most negative": (Feedback.sentiment, False)}
+
+@cached("quest_stats", lambda quest_ids: [f"quest:{qid}" for qid in quest_ids])
+def quest_stats(db, quest_ids: List[int]) -> Dict[int, Any]:
+    """Founder Quests cards — count, mean sentiment/quality and last activity for all quests in 1 query."""
+    if not quest_ids:
+        return {}
+    q = select(Feedback.quest_id, func.count().label("n"), func.avg(Feedback.sentiment).label("sentiment"),
+               func.avg(Feedback.quality_score).label("quality"), func.max(Feedback.created_at).label("last_at")) \
+        .where(Feedback.quest_id.in_(list(quest_ids))).group_by(Feedback.quest_id)
+    return {row.quest_id: row for row in db.execute(q)}
+
+@cached("feedback_page", lambda quest_id, *a, **kw: (f"quest:{quest_id}",))
+def feedback_page(db, quest_id: int, after: Tuple[Any, int] | None = None, sort: str = "newest",
+                  min_quality: float | None = None, negative_only: bool = False, hide_duplicates: bool = False,
+                  limit: int = FEEDBACK_PAGE) -> List:
+    """One page of a quest's feedback, sorted and filtered in SQL; `after` is the (sort value, id)
+    of the previous page's last row. "newest"/"oldest" walk ix_feedback_quest_created."""
+    col, desc = FEEDBACK_SORTS[sort]
+    q = select(*FEEDBACK_COLS).where(Feedback.quest_id == quest_id)
+    if min_quality is not None:
+        q = q.where(Feedback.quality_score >= min_quality)
+    if negative_only:
+        q = q.where(Feedback.sentiment < 0)
+    if hide_duplicates:
+        q = q.where(Feedback.duplicate_of.is_(None))
+    if after is not None:
+        value, fid = after
+        q = q.where(or_(col < value, and_(col == value, Feedback.id < fid)) if desc else
+                    or_(col > value, and_(col == value, Feedback.id > fid)))
+    q = q.order_by(col.desc(), Feedback.id.desc()) if desc else q.order_by(col, Feedback.id)
+    return db.execute(q.limit(limit)).all()
+
+@cached("critic_feedback", lambda critic_id: (f"critic:{critic_id}",))
+def critic_feedback(db, critic_id: int) -> List:
+    """Feedback page — 1 query on (critic_id, created_at)."""
+    q = select(*FEEDBACK_COLS).where(Feedback.critic_id == critic_id).order_by(Feedback.created_at.desc())
+    return db.execute(q).all()
@@ -0,0 +1,62 @@
+from __future__ import annotations
+import json, time, argparse
+from typing import Dict, List
+from sqlalchemy import select, update
+
+from db import init_db, SessionLocal, Project, Quest, Feedback, bump
+from feedback import score_texts
+from rules import rules_for_project
+import rollups, health
+
+# Re-run sentiment and the quality rules over a project's stored feedback after a lexicon or rule change.
+# Sentiment goes through the content-hash cache, so unchanged text under an unchanged lexicon is free;
+# only rows whose scores actually moved are written, with one bulk UPDATE per chunk.
+SCORES = ("sentiment", "specificity", "helpfulness", "quality_score", "suggestions")
+
+def rescore_project(db, project_id: int, chunk: int = 5000, processes: int | None = 1) -> Dict[str, float]:
+    """Points already paid stay in the ledger; trends and the Impact Meter are rebuilt from the new scores."""
+    rules = rules_for_project(db.get(Project, project_id))
+    start = time.perf_counter()
+    after, scanned, changed = 0, 0, 0
+    quests, critics = set(), set()
+    while True:
+        rows = db.execute(select(Feedback.id, Feedback.quest_id, Feedback.critic_id, Feedback.text,
+                                 *(getattr(Feedback, c) for c in SCORES))
+                          .join(Quest).where(Quest.project_id == project_id, Feedback.id > after)
+                          .order_by(Feedback.id).limit(chunk)).all()
+        if not rows:
+            break
+        after = rows[-1].id
+        updates: List[Dict] = []
+        for r, new in zip(rows, score_texts([r.text for r in rows], rules, processes)):
+            if any(getattr(r, c) != new[c] for c in SCORES):
+                updates.append({"id": r.id, **new})
+                quests.add(r.quest_id)
+                critics.add(r.critic_id)
+        if updates:
+            db.execute(update(Feedback), updates)
+        db.commit()
+        scanned += len(rows)
+        changed += len(updates)
+    if changed:
+        rollups.rebuild(db, project_id)
+        bump(db, "feedback", f"project:{project_id}", *(f"quest:{q}" for q in quests), *(f"critic:{c}" for c in critics))
+        health.rebuild(db, project_id)   # commits
+    seconds = time.perf_counter() - start
+    return {"project": project_id, "rows": scanned, "changed": changed, "seconds": round(seconds, 3),
+            "rows_per_sec": round(scanned / seconds, 1) if seconds else 0.0}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Recompute sentiment and quality scores for stored feedback.")
+    ap.add_argument("--project", type=int, help="only this project (default: all)")
+    ap.add_argument("--chunk", type=int, default=5000)
+    ap.add_argument("--processes", type=int, default=None, help="sentiment workers (default: all cores)")
+    args = ap.parse_args()
+    init_db()
+    db = SessionLocal()
+    try:
+        pids = [args.project] if args.project is not None else db.execute(select(Project.id).order_by(Project.id)).scalars().all()
+        for pid in pids:
+            print(json.dumps(rescore_project(db, pid, args.chunk, args.processes)))
+    finally:
+        db.close()
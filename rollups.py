@@ -0,0 +1,124 @@
+from __future__ import annotations
+import json, argparse, datetime as dt
+from collections import defaultdict
+from typing import Dict, List, Iterable, Tuple, Any
+from sqlalchemy import select, insert, update, delete
+
+from db import init_db, SessionLocal, Rollup, Feedback, Quest, Project, bump
+from cache import cached
+
+# Hourly and daily buckets per project, per quest and per cluster. Each holds count, sum and sum of squares
+# of sentiment and quality plus a quality histogram, so means/stddevs/distributions over any range come
+# from a few hundred rows. Inserts add to them in the same transaction; relabelled clusters move rows
+# between cluster buckets; `python rollups.py` rebuilds everything from raw feedback.
+GRAINS = ("hour", "day")
+HIST_BINS = 5
+ALL_QUESTS, ALL_CLUSTERS = 0, -1
+KEY = ("project_id", "quest_id", "cluster_id", "grain", "bucket")
+MEASURES = ("n", "sentiment_sum", "sentiment_sq", "quality_sum", "quality_sq") + tuple(f"h{i}" for i in range(HIST_BINS))
+
+def bucket_start(ts: dt.datetime, grain: str) -> dt.datetime:
+    ts = ts.replace(minute=0, second=0, microsecond=0)
+    return ts if grain == "hour" else ts.replace(hour=0)
+
+def accumulate(rows: Iterable[Tuple], acc: Dict[tuple, list] | None = None, sign: int = 1,
+               scopes: str = "all") -> Dict[tuple, list]:
+    """Fold (project_id, quest_id, cluster_id, created_at, sentiment, quality) rows into per-bucket deltas.
+    `scopes="clusters"` only touches the per-cluster buckets."""
+    acc = acc if acc is not None else defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0.0] + [0] * HIST_BINS)
+    for pid, qid, cid, ts, sentiment, quality in rows:
+        s, q = sentiment or 0.0, quality or 0.0
+        keys = [] if scopes == "clusters" else [(pid, ALL_QUESTS, ALL_CLUSTERS), (pid, qid, ALL_CLUSTERS)]
+        if cid is not None:
+            keys.append((pid, ALL_QUESTS, cid))
+        for grain in GRAINS:
+            b = bucket_start(ts, grain)
+            for key in keys:
+                v = acc[key + (grain, b)]
+                v[0] += sign; v[1] += sign * s; v[2] += sign * s * s; v[3] += sign * q; v[4] += sign * q * q
+                v[5 + min(HIST_BINS - 1, max(0, int(q * HIST_BINS)))] += sign
+    return acc
+
+def write(db, acc: Dict[tuple, list]):
+    """Add deltas to the stored buckets: one multi-row upsert on SQLite/Postgres."""
+    if not acc:
+        return
+    rows = [dict(zip(KEY + MEASURES, key + tuple(v))) for key, v in acc.items()]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        stmt = upsert(Rollup)
+        db.execute(stmt.on_conflict_do_update(index_elements=list(KEY), set_={
+            m: getattr(Rollup, m) + getattr(stmt.excluded, m) for m in MEASURES}), rows)
+        return
+    for r in rows:
+        where = [getattr(Rollup, k) == r[k] for k in KEY]
+        if db.execute(update(Rollup).where(*where).values({m: getattr(Rollup, m) + r[m] for m in MEASURES})
+                      .execution_options(synchronize_session=False)).rowcount == 0:
+            db.execute(insert(Rollup).values(**r))
+
+def apply_feedback(db, rows: List[Tuple]):
+    """New (project_id, quest_id, cluster_id, created_at, sentiment, quality) rows; same transaction as the insert."""
+    write(db, accumulate(rows))
+
+def relabel(db, project_id: int, moves: Dict[int, Tuple[int | None, int]], chunk: int = 5000):
+    """Move feedback between cluster buckets after (re)clustering; `moves` is {feedback_id: (old, new)}."""
+    acc = None
+    ids = list(moves)
+    for i in range(0, len(ids), chunk):
+        q = select(Feedback.id, Feedback.quest_id, Feedback.created_at, Feedback.sentiment, Feedback.quality_score) \
+            .where(Feedback.id.in_(ids[i:i + chunk]))
+        rows = db.execute(q).all()
+        acc = accumulate(((project_id, r.quest_id, moves[r.id][0], r.created_at, r.sentiment, r.quality_score)
+                          for r in rows if moves[r.id][0] is not None), acc, sign=-1, scopes="clusters")
+        acc = accumulate(((project_id, r.quest_id, moves[r.id][1], r.created_at, r.sentiment, r.quality_score)
+                          for r in rows), acc, scopes="clusters")
+    write(db, acc or {})
+
+def rebuild(db, project_id: int | None = None, chunk: int = 20000) -> Dict[str, int]:
+    """Recompute buckets from raw feedback, one project at a time (bounded memory). Caller commits."""
+    pids = [project_id] if project_id is not None else db.execute(select(Project.id).order_by(Project.id)).scalars().all()
+    buckets = 0
+    for pid in pids:
+        db.execute(delete(Rollup).where(Rollup.project_id == pid))
+        q = select(Quest.project_id, Feedback.quest_id, Feedback.cluster_id, Feedback.created_at, Feedback.sentiment,
+                   Feedback.quality_score).join(Quest).where(Quest.project_id == pid)
+        acc = accumulate(db.execute(q.execution_options(yield_per=chunk)))
+        write(db, acc)
+        buckets += len(acc)
+        bump(db, f"project:{pid}")
+    return {"projects": len(pids), "buckets": buckets}
+
+@cached("rollup_series", lambda project_id, *a, **kw: (f"project:{project_id}",))
+def series(db, project_id: int, grain: str = "day", since: dt.datetime | None = None,
+           quest_id: int = ALL_QUESTS, cluster_id: int = ALL_CLUSTERS) -> List[Dict[str, Any]]:
+    """One point per non-empty bucket: volume, mean/stddev of sentiment and quality, quality histogram."""
+    q = select(Rollup.bucket, *(getattr(Rollup, m) for m in MEASURES)).where(
+        Rollup.project_id == project_id, Rollup.quest_id == quest_id, Rollup.cluster_id == cluster_id,
+        Rollup.grain == grain, Rollup.n > 0).order_by(Rollup.bucket)
+    if since is not None:
+        q = q.where(Rollup.bucket >= bucket_start(since, grain))
+    out = []
+    for r in db.execute(q):
+        ms, mq = r.sentiment_sum / r.n, r.quality_sum / r.n
+        out.append({"bucket": r.bucket, "n": r.n, "sentiment": ms, "quality": mq,
+                    "sentiment_std": max(0.0, r.sentiment_sq / r.n - ms * ms) ** 0.5,
+                    "quality_std": max(0.0, r.quality_sq / r.n - mq * mq) ** 0.5,
+                    "hist": [getattr(r, f"h{i}") for i in range(HIST_BINS)]})
+    return out
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Rebuild the hourly/daily trend rollups from raw feedback.")
+    ap.add_argument("--project", type=int, help="only this project (default: all)")
+    args = ap.parse_args()
+    init_db()
+    db = SessionLocal()
+    try:
+        stats = rebuild(db, args.project)
+        db.commit()
+        print(json.dumps(stats))
+    finally:
+        db.close()
@@ -0,0 +1,116 @@
+from __future__ import annotations
+import os, re, json
+from functools import lru_cache
+from typing import Dict, List, Any, Iterable, Tuple
+
+RULES_DIR = os.environ.get("ITERRATE_RULES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules"))
+
+DEFAULT_RULES: Dict[str, Any] = {
+    "generic": ["good", "bad", "nice", "cool", "great"],
+    "helpful": ["change", "add", "remove", "because", "should", "consider", "instead", "confusing", "unclear",
+                "rename", "button", "cta", "contrast", "align", "spacing", "onboarding"],
+    "fixes": [
+        {"terms": ["button", "cta"], "fix": "Try a higher-contrast primary CTA above the fold."},
+        {"terms": ["signup", "sign up", "onboarding"], "fix": "Reduce onboarding to 2–3 steps; add progress indicator."},
+        {"terms": ["readable", "font", "contrast"], "fix": "Increase base font to 16–18px; check WCAG AA contrast."},
+        {"terms": ["confusing", "unclear"], "fix": "Rewrite labels with verbs; add helper text or examples."},
+    ],
+}
+
+# Merged on top of the defaults when a project carries the tag (see seed.py for the Huel tags).
+DOMAIN_RULES: Dict[str, Dict[str, Any]] = {
+    "checkout": {
+        "helpful": ["checkout", "cart", "payment", "shipping", "delivery", "basket"],
+        "fixes": [{"terms": ["shipping", "delivery cost", "hidden fee"], "fix": "Show shipping costs and delivery dates before checkout."},
+                  {"terms": ["payment", "card declined", "apple pay"], "fix": "Offer express wallets and inline card validation."}],
+    },
+    "subscription": {
+        "helpful": ["subscription", "subscribe", "toggle", "cadence", "pause", "cancel", "savings"],
+        "fixes": [{"terms": ["toggle", "subscribe", "one-time"], "fix": "Make subscribe vs one-time a clear segmented choice with the saving shown."},
+                  {"terms": ["cancel", "pause", "skip"], "fix": "Surface pause/skip/cancel next to the subscription summary."}],
+    },
+    "pricing": {
+        "helpful": ["price", "pricing", "discount", "per serving", "tier"],
+        "fixes": [{"terms": ["price", "pricing", "per serving"], "fix": "Show price per serving and compare tiers side by side."}],
+    },
+    "onboarding": {
+        "helpful": ["tutorial", "walkthrough", "first time", "empty state"],
+        "fixes": [{"terms": ["tutorial", "walkthrough", "first time"], "fix": "Replace the tour with contextual tips on first use."}],
+    },
+}
+
+_SUFFIX = r"(?:s|es|ed|d|ing)?"   # simple inflections: "changes", "added"; never "address" for "add"
+
+def merge_rules(*parts: Dict[str, Any]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"generic": [], "helpful": [], "fixes": []}
+    for part in parts:
+        for key in ("generic", "helpful"):
+            out[key] += [t for t in part.get(key, []) if t not in out[key]]
+        out["fixes"] += [f for f in part.get("fixes", []) if f not in out["fixes"]]
+        for key in ("helpful_norm", "generic_weight"):
+            if key in part:
+                out[key] = part[key]
+    return out
+
+def load_rules(tags: Iterable[str] = (), slug: str | None = None) -> Dict[str, Any]:
+    """Defaults + tag packs + an optional `rules/<slug>.json` override for the project."""
+    parts = [DEFAULT_RULES] + [DOMAIN_RULES[t] for t in (tags or []) if t in DOMAIN_RULES]
+    path = os.path.join(RULES_DIR, f"{slug}.json") if slug else None
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as fh:
+            parts.append(json.load(fh))
+    return merge_rules(*parts)
+
+def rules_for_project(project) -> Dict[str, Any]:
+    return load_rules(project.tags or [], project.slug)
+
+class CompiledRules:
+    """Every term of a ruleset in one word-bounded alternation; a text is scored in a single scan.
+    The alternation sits in a lookahead, so terms that overlap ("delivery cost" and "cost") all match;
+    a multi-word term also carries the hits of the terms inside it ("delivery"), which start at the same spot."""
+
+    def __init__(self, rules: Dict[str, Any]):
+        self.helpful_norm = float(rules.get("helpful_norm", 6.0))
+        self.generic_weight = float(rules.get("generic_weight", 0.1))
+        self.fixes = [f["fix"] for f in rules["fixes"]]
+        self.hits: Dict[str, List[Tuple[str, Any]]] = {}
+        for t in rules["generic"]:
+            self.hits.setdefault(t.lower(), []).append(("generic", t))
+        for t in rules["helpful"]:
+            self.hits.setdefault(t.lower(), []).append(("helpful", t))
+        for i, f in enumerate(rules["fixes"]):
+            for t in f["terms"]:
+                self.hits.setdefault(t.lower(), []).append(("fix", i))
+        own = {t: list(h) for t, h in self.hits.items()}
+        for t in self.hits:
+            for other in own:
+                if other != t and re.search(r"\b" + re.escape(other) + _SUFFIX + r"\b", t):
+                    self.hits[t] += own[other]
+        terms = sorted(self.hits, key=len, reverse=True)
+        self.pattern = re.compile(r"\b(?=(" + "|".join(re.escape(t) for t in terms) + r")" + _SUFFIX + r"\b)")
+
+    def evaluate(self, text: str) -> Tuple[Dict[str, float], List[str]]:
+        t = text.lower()
+        generic, helpful, fixes = set(), set(), set()
+        for m in self.pattern.finditer(t):
+            for kind, key in self.hits[m.group(1)]:
+                (generic if kind == "generic" else helpful if kind == "helpful" else fixes).add(key)
+        length_score = min(len(t) / 300.0, 1.0)
+        specificity = max(0.0, length_score - self.generic_weight * len(generic))
+        helpfulness = min(1.0, len(helpful) / self.helpful_norm)
+        quality = 0.6 * specificity + 0.4 * helpfulness
+        grade = {"specificity": specificity, "helpfulness": helpfulness, "quality": quality}
+        return grade, [self.fixes[i] for i in sorted(fixes)][:3]
+
+    def evaluate_batch(self, texts: Iterable[str]) -> List[Tuple[Dict[str, float], List[str]]]:
+        return [self.evaluate(str(t)) for t in texts]
+
+_DEFAULT_KEY = json.dumps(DEFAULT_RULES, sort_keys=True)
+
+@lru_cache(maxsize=64)
+def _compile(key: str) -> CompiledRules:
+    return CompiledRules(json.loads(key))
+
+def compiled(rules: Dict[str, Any] | None = None) -> CompiledRules:
+    """Compiled automaton for a ruleset, cached by its canonical JSON."""
+    return _compile(json.dumps(rules, sort_keys=True) if rules else _DEFAULT_KEY)
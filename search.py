@@ -0,0 +1,61 @@
+from __future__ import annotations
+import re
+from typing import Dict, Any
+from sqlalchemy import select, func, literal_column, table, column
+
+from db import Feedback, Quest
+from repo import FEEDBACK_COLS
+from cache import cached
+
+PAGE_SIZE = 20
+_FTS = table("feedback_fts", column("rowid"))
+_TOKEN = re.compile(r"\w+")
+
+def fts_query(q: str) -> str:
+    """User text -> FTS5 MATCH expression: "quoted phrases" stay phrases, every other word is ANDed.
+    Everything is re-quoted, so punctuation in the input can never be a syntax error."""
+    parts = []
+    for phrase in re.findall(r'"([^"]*)"', q):
+        words = _TOKEN.findall(phrase.lower())
+        if words:
+            parts.append('"' + " ".join(words) + '"')
+    parts += [f'"{w}"' for w in _TOKEN.findall(re.sub(r'"[^"]*"', " ", q).lower())]
+    return " ".join(parts)
+
+def _filters(q, quest_id, min_sentiment, max_sentiment, min_quality, cluster_id):
+    if quest_id is not None:
+        q = q.where(Feedback.quest_id == quest_id)
+    if min_sentiment is not None:
+        q = q.where(Feedback.sentiment >= min_sentiment)
+    if max_sentiment is not None:
+        q = q.where(Feedback.sentiment <= max_sentiment)
+    if min_quality is not None:
+        q = q.where(Feedback.quality_score >= min_quality)
+    if cluster_id is not None:
+        q = q.where(Feedback.cluster_id == cluster_id)
+    return q
+
+@cached("search", lambda project_id, *a, **kw: (f"project:{project_id}",))
+def search(db, project_id: int, query: str, quest_id: int | None = None, min_sentiment: float | None = None,
+           max_sentiment: float | None = None, min_quality: float | None = None, cluster_id: int | None = None,
+           page: int = 0, limit: int = PAGE_SIZE) -> Dict[str, Any]:
+    """Best-first matches for `query` within one project. Rows carry FEEDBACK_COLS plus `score`
+    (lower is better) and a highlighted `snippet`; `more` says whether another page exists."""
+    if not _TOKEN.search(query):
+        return {"rows": [], "more": False}
+    if db.get_bind().dialect.name == "sqlite":
+        fts = literal_column("feedback_fts")
+        score = func.bm25(fts).label("score")
+        q = select(*FEEDBACK_COLS, score, func.snippet(fts, 0, "**", "**", "…", 24).label("snippet")) \
+            .select_from(_FTS).join(Feedback, Feedback.id == _FTS.c.rowid) \
+            .where(fts.op("MATCH")(fts_query(query)))
+    else:
+        tsv, tsq = func.to_tsvector("english", Feedback.text), func.plainto_tsquery("english", query)
+        score = (-func.ts_rank(tsv, tsq)).label("score")
+        q = select(*FEEDBACK_COLS, score, func.ts_headline("english", Feedback.text, tsq,
+                                                           "StartSel=**, StopSel=**").label("snippet")) \
+            .where(tsv.op("@@")(tsq))
+    q = q.join(Quest, Quest.id == Feedback.quest_id).where(Quest.project_id == project_id)
+    q = _filters(q, quest_id, min_sentiment, max_sentiment, min_quality, cluster_id)
+    rows = db.execute(q.order_by(score, Feedback.id).offset(page * limit).limit(limit + 1)).all()
+    return {"rows": rows[:limit], "more": len(rows) > limit}
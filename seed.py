@@ -1,6 +1,8 @@
-
 from __future__ import annotations
-import datetime as dt
+import json, random, argparse, datetime as dt
+from typing import Iterator, List, Dict, Any
+from sqlalchemy import insert, select
+
 from db import init_db, SessionLocal, User, Project, Quest
 from utils import mk_slug
 
@@ -40,5 +42,108 @@ def seed():
     db.close()
     print("Seeded demo data (Huel).")
 
+# ---- Synthetic load generator ----
+
+TAG_POOL = ["ux", "website", "onboarding", "checkout", "subscription", "pricing", "mobile", "copy", "dtc", "saas"]
+AREAS = ["checkout", "subscription toggle", "product page", "signup form", "pricing table", "navigation menu",
+         "search results", "cart drawer", "delivery options", "flavour picker", "hero banner", "account settings",
+         "onboarding flow", "payment step", "order summary", "help centre"]
+ISSUES = ["is confusing", "feels slow to load", "is hard to find", "has low contrast", "hides the total price",
+          "needs clearer labels", "breaks on mobile", "is unclear about the savings", "asks for too much information",
+          "uses vague copy", "has misaligned spacing", "does not explain the delivery cadence", "works well",
+          "looks great", "is easy to use"]
+SUGGESTIONS = ["Consider moving the main CTA above the fold.", "You should add a progress indicator.",
+               "Rename the button so it starts with a verb.", "Add helper text with an example.",
+               "Show the price per serving instead of the bundle price.", "Remove the optional fields.",
+               "Increase the font size and contrast.", "Change the default to one-time purchase.",
+               "Align the cards to a single column on mobile.", "Because of this I almost abandoned the order.", ""]
+OPENERS = ["", "Overall good experience, but", "Honestly,", "As a first-time buyer,", "I love the product, however",
+           "Frustrating:", "Quick note:", "On my phone", "Compared to competitors,"]
+
+def feedback_text(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.choice((1, 1, 2, 3))):
+        opener = rng.choice(OPENERS)
+        parts.append(f"{opener} the {rng.choice(AREAS)} {rng.choice(ISSUES)}.".strip().capitalize()
+                     + (" " + rng.choice(SUGGESTIONS) if rng.random() < 0.7 else ""))
+    return " ".join(p.strip() for p in parts)
+
+def feedback_records(n: int, quest_ids: List[int], critic_ids: List[int], seed: int = 42,
+                     days: int = 365) -> Iterator[Dict[str, Any]]:
+    """Deterministic stream of raw feedback records (same seed -> same texts, authors and timestamps)."""
+    rng = random.Random(seed)
+    now = dt.datetime(2026, 1, 1)
+    for _ in range(n):
+        yield {"quest_id": rng.choice(quest_ids), "critic_id": rng.choice(critic_ids), "text": feedback_text(rng),
+               "created_at": (now - dt.timedelta(seconds=rng.randint(0, days * 86400))).isoformat()}
+
+def generate(founders: int = 5, critics: int = 200, projects: int = 10, quests: int = 4, feedback: int = 10_000,
+             seed: int = 42, out: str | None = None, chunk: int = 5000) -> Dict[str, int]:
+    """Bulk-create a synthetic tenant. Feedback goes through the real scoring/insert pipeline,
+    or to a JSONL file for `ingest.py` when `out` is given."""
+    from feedback import score_texts, insert_feedback
+    from rules import rules_for_project
+    rng = random.Random(seed)
+    init_db()
+    db = SessionLocal()
+    tag = f"s{seed}"
+    db.execute(insert(User), [dict(email=f"founder{i}.{tag}@load.test", password="demo", role="founder",
+                                   name=f"Founder {i}", points=0, badges=[]) for i in range(founders)])
+    db.execute(insert(User), [dict(email=f"critic{i}.{tag}@load.test", password="demo", role="critic",
+                                   name=f"Critic {i}", points=0, badges=[]) for i in range(critics)])
+    founder_ids = db.execute(select(User.id).where(User.role == "founder", User.email.like(f"%.{tag}@load.test"))).scalars().all()
+    critic_ids = db.execute(select(User.id).where(User.role == "critic", User.email.like(f"%.{tag}@load.test"))).scalars().all()
+    db.execute(insert(Project), [dict(owner_id=rng.choice(founder_ids), name=f"Load project {i} ({tag})",
+                                      slug=mk_slug(f"load {tag} {i}"), description="Synthetic project.",
+                                      tags=rng.sample(TAG_POOL, 3)) for i in range(projects)])
+    project_rows = db.query(Project).filter(Project.slug.like(f"load-{tag}-%")).all()
+    db.execute(insert(Quest), [dict(project_id=p.id, title=f"Quest {j} for {p.name}", brief="Synthetic quest.",
+                                    tags=rng.sample(TAG_POOL, 2), reward_type="points",
+                                    reward_value=float(rng.choice((10, 15, 20, 25, 30))))
+                               for p in project_rows for j in range(quests)])
+    db.commit()
+    quest_rows = {q.id: q for q in db.query(Quest).filter(Quest.project_id.in_([p.id for p in project_rows]))}
+    rulesets = {p.id: rules_for_project(p) for p in project_rows}
+    records = feedback_records(feedback, list(quest_rows), critic_ids, seed=seed)
+    if out:
+        with open(out, "w", encoding="utf-8") as fh:
+            for r in records:
+                fh.write(json.dumps(r) + "\n")
+    else:
+        batch: List[Dict[str, Any]] = []
+        def flush():
+            by_project: Dict[int, List[Dict[str, Any]]] = {}
+            for r in batch:
+                by_project.setdefault(quest_rows[r["quest_id"]].project_id, []).append(r)
+            for pid, rows in by_project.items():
+                scored = score_texts([r["text"] for r in rows], rulesets[pid])
+                insert_feedback(db, [{**r, "created_at": dt.datetime.fromisoformat(r["created_at"]), **s}
+                                     for r, s in zip(rows, scored)], quest_rows)
+            db.commit()
+            batch.clear()
+        for r in records:
+            batch.append(r)
+            if len(batch) >= chunk:
+                flush()
+        if batch:
+            flush()
+    db.close()
+    return {"founders": founders, "critics": critics, "projects": projects,
+            "quests": len(quest_rows), "feedback": feedback}
+
 if __name__ == "__main__":
-    seed()
+    ap = argparse.ArgumentParser(description="Seed the demo data, or generate a synthetic load dataset with --scale.")
+    ap.add_argument("--scale", action="store_true")
+    ap.add_argument("--founders", type=int, default=5)
+    ap.add_argument("--critics", type=int, default=200)
+    ap.add_argument("--projects", type=int, default=10)
+    ap.add_argument("--quests", type=int, default=4, help="quests per project")
+    ap.add_argument("--feedback", type=int, default=10_000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", help="write feedback as JSONL for ingest.py instead of inserting it")
+    args = ap.parse_args()
+    if args.scale:
+        print(json.dumps(generate(args.founders, args.critics, args.projects, args.quests, args.feedback,
+                                  args.seed, args.out)))
+    else:
+        seed()
@@ -0,0 +1,30 @@
+import os, sys, tempfile
+
+# db.py reads DATABASE_URL at import time: point every test run at its own SQLite file first.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="iterrate-test-"), "test.db")
+os.environ["ITERRATE_SENTIMENT_CACHE"] = "off"
+
+import pytest
+
+@pytest.fixture
+def db():
+    """A freshly reset and demo-seeded database (one founder, one critic, one project, two quests)."""
+    import db as models, seed, cache, leaderboard
+    models.reset_db()
+    seed.seed()
+    cache.STORE.clear()
+    cache.resource("cluster_states", dict).clear()
+    leaderboard.invalidate()
+    session = models.SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def critics(db):
+    """Six extra critics, so tests can submit without tripping the near-duplicate check."""
+    from db import User
+    users = [User(email=f"critic{i}@test.io", password="x", role="critic", name=f"Critic {i}") for i in range(6)]
+    db.add_all(users)
+    db.commit()
+    return [u.id for u in users]
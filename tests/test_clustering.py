@@ -0,0 +1,20 @@
+from db import Quest
+from feedback import submit_feedback
+from clustering import recluster
+
+REVIEWS = [
+    "The subscription toggle is hidden below the fold and the savings are unclear.",
+    "Checkout asks for my phone number twice, please remove the duplicate field.",
+    "Delivery cadence options are confusing, show weekly versus monthly clearly.",
+    "The flavour picker images are tiny on mobile, make them larger.",
+    "Pricing table hides the per serving cost; show it next to the bundle price.",
+    "Signup form error messages disappear too quickly to read.",
+]
+
+def test_first_fit_on_fresh_rows_has_top_terms(db, critics):
+    quest = db.query(Quest).first()
+    for critic_id, text in zip(critics, REVIEWS):
+        submit_feedback(db, quest.id, critic_id, text)
+    res = recluster(db, quest.project_id, force=True)
+    assert res["top_terms"]
+    assert all(res["top_terms"].values())
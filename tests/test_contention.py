@@ -0,0 +1,16 @@
+import multiprocessing as mp
+from sqlalchemy import func
+from db import Feedback, Quest
+from bench import _contend
+
+PROCESSES, WRITES = 6, 15
+
+def test_concurrent_writers_do_not_fail(db, critics):
+    """Separate processes submitting at once: WAL + busy_timeout must absorb every lock wait."""
+    quest_ids = [q for q, in db.query(Quest.id).all()]
+    db.close()   # nothing open in the parent while the children write
+    with mp.get_context("fork").Pool(PROCESSES) as pool:
+        outcomes = pool.map(_contend, [(quest_ids, critics, WRITES, i) for i in range(PROCESSES)])
+    failed, duplicates = (sum(col) for col in zip(*outcomes))
+    assert failed == 0
+    assert db.query(func.count(Feedback.id)).scalar() == PROCESSES * WRITES - duplicates
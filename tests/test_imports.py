@@ -0,0 +1,12 @@
+import os, sys, json, subprocess
+import pytest
+
+HEAVY = ("sklearn", "scipy", "nltk")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.mark.parametrize("module", ["db", "repo", "leaderboard", "feedback", "jobs", "ai"])
+def test_module_imports_without_ml_libraries(module):
+    """Each in a fresh interpreter: a top-level sklearn/scipy/nltk import costs every page its cold start."""
+    probe = f"import sys, json, {module}; print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+    proc = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert json.loads(proc.stdout.strip().splitlines()[-1]) == []
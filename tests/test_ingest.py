@@ -0,0 +1,43 @@
+import json
+import pytest
+from sqlalchemy import func
+from db import Feedback, Quest, User
+from ingest import ingest_file
+from ledger import award
+
+def test_unknown_or_malformed_records_are_skipped(db, critics, tmp_path):
+    quest = db.query(Quest).first()
+    founder = db.query(User).filter_by(role="founder").first()
+    records = [
+        {"quest_id": quest.id, "critic_id": critics[0], "text": "The checkout button is hard to find on mobile."},
+        {"quest_id": quest.id, "critic_id": 999, "text": "Unknown critic."},
+        {"quest_id": quest.id, "critic_id": founder.id, "text": "Founders are not critics."},
+        {"quest_id": quest.id, "critic_id": "abc", "text": "Non-numeric critic id."},
+        {"quest_id": "x", "critic_id": critics[1], "text": "Non-numeric quest id."},
+        {"quest_id": quest.id, "critic_email": "nobody@test.io", "text": "Unknown email."},
+        {"quest_id": quest.id, "critic_id": critics[2], "text": "Bad timestamp.", "created_at": "yesterday"},
+    ]
+    path = tmp_path / "feedback.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in records))
+    stats = ingest_file(str(path), workers=1, log=lambda _: None)
+    assert (stats["rows"], stats["skipped"]) == (1, 6)
+    assert db.query(func.count(Feedback.id)).scalar() == 1
+
+def test_default_critic_only_fills_records_without_a_critic(db, critics, tmp_path):
+    quest = db.query(Quest).first()
+    default = db.get(User, critics[0])
+    records = [
+        {"quest_id": quest.id, "text": "No critic given, so the default critic gets this one."},
+        {"quest_id": quest.id, "critic_email": "nobody@test.io", "text": "Unknown email is not the default critic."},
+        {"quest_id": quest.id, "critic_id": 999, "text": "Unknown id is not the default critic either."},
+    ]
+    path = tmp_path / "feedback.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in records))
+    stats = ingest_file(str(path), critic_email=default.email, workers=1, log=lambda _: None)
+    assert (stats["rows"], stats["skipped"]) == (1, 2)
+    assert db.query(Feedback.critic_id).scalar() == default.id
+
+def test_award_refuses_unknown_critic(db):
+    quest = db.query(Quest).first()
+    with pytest.raises(ValueError, match="Unknown critic"):
+        award(db, [{"critic_id": 999, "quest_id": quest.id, "feedback_id": None, "amount": 10}])
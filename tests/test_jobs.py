@@ -0,0 +1,54 @@
+import datetime as dt
+from sqlalchemy import update
+import jobs
+from db import SessionLocal, Job, Quest
+from feedback import submit_feedback
+from tests.test_clustering import REVIEWS
+
+def test_review_arriving_mid_job_is_skipped(db, critics, monkeypatch):
+    quest = db.query(Quest).first()
+    for critic_id, text in zip(critics[:5], REVIEWS):
+        submit_feedback(db, quest.id, critic_id, text)
+    recluster = jobs.recluster
+
+    def recluster_then_submit(session, project_id, force=False):
+        res = recluster(session, project_id, force=force)
+        submit_feedback(session, quest.id, critics[5], REVIEWS[5])   # lands after recluster's snapshot
+        return res
+    monkeypatch.setattr(jobs, "recluster", recluster_then_submit)
+    job = jobs.enqueue(db, quest.project_id, quest.id, force=True)
+    jobs.run_job(db, job)
+    assert job.status == "done"
+    assert jobs.summaries.uncached(db, quest.project_id, quest.id)
+
+def test_force_upgrades_a_live_job_and_requeues_it_mid_run(db, critics, monkeypatch):
+    quest = db.query(Quest).first()
+    for critic_id, text in zip(critics[:5], REVIEWS):
+        submit_feedback(db, quest.id, critic_id, text)
+    job = jobs.enqueue(db, quest.project_id)
+    assert jobs._claim(db, "pid:test").id == job.id
+    recluster = jobs.recluster
+
+    def recluster_then_force(session, project_id, force=False):
+        res = recluster(session, project_id, force=force)
+        other = SessionLocal()
+        try:   # a founder ticks "Force full refit" while the plain refit is still running
+            assert jobs.enqueue(other, project_id, force=True).id == job.id
+        finally:
+            other.close()
+        return res
+    monkeypatch.setattr(jobs, "recluster", recluster_then_force)
+    jobs.run_job(db, job)
+    assert (job.status, job.force) == ("queued", True)
+
+def test_heartbeat_keeps_a_long_job_from_being_reclaimed(db):
+    quest = db.query(Quest).first()
+    job = jobs.enqueue(db, quest.project_id)
+    assert jobs._claim(db, "pid:first").id == job.id
+    old = dt.datetime.utcnow() - 2 * jobs.STALE_AFTER
+    db.execute(update(Job).where(Job.id == job.id).values(started_at=old, heartbeat_at=dt.datetime.utcnow()))
+    db.commit()
+    assert jobs._claim(db, "pid:second") is None
+    db.execute(update(Job).where(Job.id == job.id).values(heartbeat_at=old))
+    db.commit()
+    assert jobs._claim(db, "pid:second").id == job.id
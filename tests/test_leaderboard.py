@@ -0,0 +1,15 @@
+import leaderboard
+from db import User, Quest
+from ledger import award
+
+def test_rolled_back_award_leaves_rank_index_alone(db, critics):
+    quest = db.query(Quest).first()
+    demo = db.query(User).filter_by(email="critic@demo.io").one()
+    assert leaderboard.rank_of(db, demo.id) == (1, 7)   # everyone tied on 0 points
+    db.commit()
+    award(db, [{"critic_id": demo.id, "quest_id": quest.id, "feedback_id": None, "amount": 50}])
+    db.rollback()
+    award(db, [{"critic_id": critics[0], "quest_id": quest.id, "feedback_id": None, "amount": 10}])
+    db.commit()
+    assert leaderboard.rank_of(db, demo.id) == (2, 7)
+    assert leaderboard.rank_of(db, critics[0]) == (1, 7)
@@ -0,0 +1,20 @@
+import datetime as dt
+import pytest
+from sqlalchemy import func
+from db import Feedback, Quest
+from dedup import DuplicateFeedback
+from raids import WriteBuffer, _Pending, create_raid
+
+def test_copies_within_one_flush_are_rejected_not_stored(db, critics):
+    quest = db.query(Quest).first()
+    raid = create_raid(db, quest.id, "Launch day", dt.datetime.utcnow(), reward_boost=2.0)
+    text = "The pricing page hides the annual discount until the very last checkout step."
+    first, copy = (_Pending(quest.id, critics[0], text, raid.id) for _ in range(2))
+    other = _Pending(quest.id, critics[1], text, raid.id)   # same words from another critic are not a copy
+    WriteBuffer()._flush([first, copy, other])
+    fid, pts = first.future.result(timeout=0)
+    assert pts > 0 and other.future.result(timeout=0)[1] > 0
+    with pytest.raises(DuplicateFeedback) as e:
+        copy.future.result(timeout=0)
+    assert e.value.original_id == fid
+    assert db.query(func.count(Feedback.id)).filter(Feedback.raid_id == raid.id).scalar() == 2
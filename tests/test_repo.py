@@ -0,0 +1,50 @@
+import contextlib
+import pytest
+from sqlalchemy import event
+
+import repo, health, leaderboard
+from db import engine, Quest, User
+from feedback import submit_feedback
+from tests.test_clustering import REVIEWS
+
+@contextlib.contextmanager
+def count_queries():
+    counter = {"n": 0}
+    def before(*_):
+        counter["n"] += 1
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+
+@pytest.fixture
+def page_data(db, critics):
+    quests = db.query(Quest).all()
+    for i, (critic_id, text) in enumerate(zip(critics, REVIEWS)):
+        submit_feedback(db, quests[i % len(quests)].id, critic_id, text)
+    founder = db.query(User).filter_by(role="founder").one()
+    return founder.id, critics[0], [q.id for q in quests], quests[0].project_id
+
+# the uncached reads, so the count is the page's own SQL and not the version-counter lookup
+PAGES = {
+    "home": (lambda d: repo.home_projects.uncached(d["db"]), 1),
+    "projects": (lambda d: repo.projects.uncached(d["db"], d["founder"]), 1),
+    "quests_critic": (lambda d: repo.quests.uncached(d["db"]), 1),
+    "quests_founder": (lambda d: repo.quests.uncached(d["db"], d["founder"]), 1),
+    "quest_stats": (lambda d: repo.quest_stats.uncached(d["db"], d["quests"]), 1),
+    "quest_feedback_page": (lambda d: repo.feedback_page.uncached(d["db"], d["quests"][0]), 1),
+    "critic_feedback": (lambda d: repo.critic_feedback.uncached(d["db"], d["critic"]), 1),
+    "insights_health": (lambda d: health.project_health.uncached(d["db"], [d["project"]]), 1),
+    "leaderboard_page": (lambda d: leaderboard.page(d["db"]), 1),
+}
+
+@pytest.mark.parametrize("page", sorted(PAGES))
+def test_query_count_per_page(db, page_data, page):
+    founder, critic, quests, project = page_data
+    fn, expected = PAGES[page]
+    data = {"db": db, "founder": founder, "critic": critic, "quests": quests, "project": project}
+    with count_queries() as queries:
+        rows = fn(data)
+    assert rows
+    assert queries["n"] == expected
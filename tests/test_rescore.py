@@ -0,0 +1,29 @@
+from sqlalchemy import update
+from db import Feedback, HealthAggregate, Project, Quest, User
+from feedback import submit_feedback
+from health import project_health
+from rescore import rescore_project
+from tests.test_clustering import REVIEWS
+
+def test_rescore_fixes_drifted_rows_and_only_touches_its_project(db, critics):
+    founder = db.query(User).filter_by(role="founder").one()
+    other = Project(owner_id=founder.id, name="Other", slug="other")
+    db.add(other)
+    db.flush()
+    db.add(Quest(project_id=other.id, title="Other quest", reward_value=10))
+    db.commit()
+    quests = db.query(Quest).order_by(Quest.id).all()
+    for i, (critic_id, text) in enumerate(zip(critics, REVIEWS)):
+        submit_feedback(db, quests[i % len(quests)].id, critic_id, text)
+    project = quests[0].project_id
+    expected = project_health.uncached(db, [project])[project]
+    other_rows = {r.id for r in db.query(HealthAggregate).filter_by(project_id=other.id)}
+    mine = [q.id for q in quests if q.project_id == project]
+    db.execute(update(Feedback).where(Feedback.quest_id.in_(mine)).values(sentiment=0.0, quality_score=0.0))
+    db.commit()
+
+    stats = rescore_project(db, project)
+    assert stats["changed"] == sum(1 for i in range(len(REVIEWS)) if quests[i % len(quests)].project_id == project)
+    assert project_health.uncached(db, [project])[project] == expected
+    assert {r.id for r in db.query(HealthAggregate).filter_by(project_id=other.id)} == other_rows
+    assert rescore_project(db, project)["changed"] == 0
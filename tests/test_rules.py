@@ -0,0 +1,16 @@
+from rules import compiled, load_rules
+
+def test_multi_word_term_counts_its_component_terms():
+    grade, fixes = compiled(load_rules(["checkout"])).evaluate("the delivery cost is high")
+    assert grade["helpfulness"] > 0                      # "delivery" is a checkout helpful term
+    assert "Show shipping costs and delivery dates before checkout." in fixes
+
+def test_overlapping_terms_both_match():
+    rules = {"generic": [], "helpful": ["sign up", "up front"], "fixes": []}
+    grade, _ = compiled(rules).evaluate("make me sign up front")
+    assert grade["helpfulness"] == 2 / 6
+
+def test_inflections_still_match_but_not_prefixes():
+    rules = {"generic": [], "helpful": ["add"], "fixes": []}
+    assert compiled(rules).evaluate("please added")[0]["helpfulness"] > 0
+    assert compiled(rules).evaluate("my address")[0]["helpfulness"] == 0
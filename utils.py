@@ -5,14 +5,15 @@ from slugify import slugify
 def mk_slug(name: str) -> str:
     return slugify(name)
 
+BADGE_THRESHOLDS = [(50, "Contributor"), (200, "Pro Reviewer"), (500, "Hall of Fame")]
+
 def sample_badges(points: int) -> list[str]:
-    badges = []
-    if points >= 50: badges.append("Contributor")
-    if points >= 200: badges.append("Pro Reviewer")
-    if points >= 500: badges.append("Hall of Fame")
-    return badges
+    return [name for threshold, name in BADGE_THRESHOLDS if points >= threshold]
+
+def crosses_badge(old: int, new: int) -> bool:
+    return any(min(old, new) < threshold <= max(old, new) for threshold, _ in BADGE_THRESHOLDS)
 
-def reward_points(quality: float, reward_value: float) -> int:
+def reward_points(quality: float, reward_value: float, boost: float = 1.0) -> int:
     base = reward_value
     mult = 0.5 + 1.5 * quality
-    return int(base * mult)
+    return int(base * mult * boost)